@@ -0,0 +1,15 @@
+'''
+Общие модули для приложений homework3 и homework4_5_6.
+
+    upstream.py      - запросы к random-d.uk, randomfox.ca и jsonplaceholder:
+                       общий пул соединений, кеш, пулы предзагрузки
+    prefetch.py      - PrefetchPool, фоновая предзагрузка случайных уток и лис
+    breaker.py       - предохранители и хеджирование запросов к внешним API
+    weather.py       - кеш погоды OWM и бэкенд без сети для тестов
+    stub_upstream.py - локальная заглушка внешних API для тестов и нагрузки
+
+Приложения добавляют корень репозитория в sys.path и импортируют модули как
+common.upstream и т.д. (так же task1 и task2 в homework2 используют общие
+модули из homework2).
+
+'''
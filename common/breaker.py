@@ -0,0 +1,235 @@
+'''
+Предохранители (circuit breaker) и хеджирование запросов к внешним API для
+task3.py.
+
+У каждого внешнего API свой CircuitBreaker. Он помнит исходы последних
+window вызовов; если среди них (при хотя бы min_calls вызовах) доля ошибок
+больше failure_rate или доля медленных (дольше slow_call секунд) больше
+slow_rate, предохранитель размыкается. Пока он разомкнут (open_for секунд),
+вызовы сразу получают CircuitOpenError, и представления показывают свои
+заглушки, а не ждут таймаута. Потом пропускается один пробный вызов
+(half-open): если он быстрый и успешный, предохранитель замыкается.
+
+call(..., hedge=True) - хеджированный вызов: запрос уходит в hedge_executor,
+и если он не ответил за p95 последних успешных вызовов, туда же уходит
+второй; берется первый успешный ответ, а ошибка - только если упали оба.
+Ждем не дольше hedge_max_wait секунд. Места в пуле выдает hedge_slots (по
+числу его потоков), поэтому задача никогда не стоит в очереди и время
+ожидания не попадает в измеренную задержку; если мест нет, вызов просто
+выполняется в потоке вызывающего без дубля. Доля хеджированных вызовов
+ограничена hedge_budget, чтобы при общей деградации API не удваивать
+нагрузку на него.
+
+Исход вызова, начатого до смены состояния (например, медленный запрос,
+ответивший уже после размыкания), отбрасывается и считается в late: иначе
+он мог бы снова разомкнуть только что замкнутый предохранитель.
+
+Исключения из ignore (например, "город не найден") - ответ API, а не его
+отказ, поэтому они пробрасываются, но считаются успешными вызовами.
+
+Состояние всех предохранителей - breaker_stats().
+
+'''
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+WINDOW = 20
+MIN_CALLS = 5
+FAILURE_RATE = 0.5
+SLOW_RATE = 0.5
+SLOW_CALL = float(os.environ.get('BREAKER_SLOW_CALL', 2.0))
+OPEN_FOR = float(os.environ.get('BREAKER_OPEN_FOR', 30.0))
+
+LATENCY_WINDOW = 100
+HEDGE_MIN_SAMPLES = 20
+HEDGE_BUDGET = 0.1
+HEDGE_WORKERS = int(os.environ.get('BREAKER_HEDGE_WORKERS', 64))
+HEDGE_MAX_WAIT = float(os.environ.get('BREAKER_HEDGE_MAX_WAIT', 30.0))
+
+hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+hedge_slots = threading.BoundedSemaphore(HEDGE_WORKERS)
+breakers = {}
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    def __init__(self, name, window=WINDOW, min_calls=MIN_CALLS, failure_rate=FAILURE_RATE,
+                 slow_call=SLOW_CALL, slow_rate=SLOW_RATE, open_for=OPEN_FOR, hedge_budget=HEDGE_BUDGET,
+                 hedge_max_wait=HEDGE_MAX_WAIT, ignore=()):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_for = open_for
+        self.hedge_budget = hedge_budget
+        self.hedge_max_wait = hedge_max_wait
+        self.ignore = tuple(ignore)
+
+        self.state = 'closed'
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._open_until = 0.0
+        self._trial = False
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.late = 0
+
+        breakers[name] = self
+
+    def _allow(self):
+        # возвращает поколение состояния, в котором начат вызов, или None
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() < self._open_until:
+                    self.rejected += 1
+                    return None
+                self._set_state_locked('half_open')
+                self._trial = False
+
+            if self.state == 'half_open':
+                # в полуоткрытом состоянии - только один пробный вызов за раз
+                if self._trial:
+                    self.rejected += 1
+                    return None
+                self._trial = True
+
+            self.calls += 1
+            return self._generation
+
+    def _set_state_locked(self, state):
+        self.state = state
+        self._generation += 1
+
+    def _open_locked(self):
+        self._set_state_locked('open')
+        self._open_until = time.monotonic() + self.open_for
+        self._outcomes.clear()
+        self.opened += 1
+
+    def _record(self, ok, duration, generation):
+        slow = duration >= self.slow_call
+        with self._lock:
+            if ok:
+                self._latencies.append(duration)
+            else:
+                self.failures += 1
+
+            if generation != self._generation:
+                self.late += 1
+                return
+
+            if self.state == 'half_open':
+                self._trial = False
+                if ok and not slow:
+                    self._set_state_locked('closed')
+                    self._outcomes.clear()
+                else:
+                    self._open_locked()
+                return
+
+            self._outcomes.append((ok, slow))
+            if len(self._outcomes) >= self.min_calls:
+                failures = sum(1 for ok, _slow in self._outcomes if not ok) / len(self._outcomes)
+                slow_calls = sum(1 for _ok, slow in self._outcomes if slow) / len(self._outcomes)
+                if failures >= self.failure_rate or slow_calls >= self.slow_rate:
+                    self._open_locked()
+
+    def p95(self):
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def _hedge_allowed(self):
+        with self._lock:
+            return self.hedged < self.calls * self.hedge_budget
+
+    def call(self, function, *args, hedge=False):
+        generation = self._allow()
+        if generation is None:
+            raise CircuitOpenError(f"{self.name}: внешний API временно отключен")
+
+        started = time.monotonic()
+        try:
+            result = self._hedged(function, args) if hedge else function(*args)
+        except self.ignore:
+            self._record(True, time.monotonic() - started, generation)
+            raise
+        except Exception:
+            self._record(False, time.monotonic() - started, generation)
+            raise
+        self._record(True, time.monotonic() - started, generation)
+        return result
+
+    def _submit(self, function, args):
+        # место в пуле уже занято через hedge_slots, задача не ждет в очереди
+        future = hedge_executor.submit(function, *args)
+        future.add_done_callback(lambda _future: hedge_slots.release())
+        return future
+
+    def _hedged(self, function, args):
+        delay = self.p95()
+        if delay is None or not hedge_slots.acquire(blocking=False):
+            return function(*args)
+
+        first = self._submit(function, args)
+        second = None
+        done, _pending = wait([first], timeout=delay)
+        if not done and self._hedge_allowed() and hedge_slots.acquire(blocking=False):
+            with self._lock:
+                self.hedged += 1
+            second = self._submit(function, args)
+
+        deadline = time.monotonic() + self.hedge_max_wait
+        pending = {first, second} - {None}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=deadline - time.monotonic(), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"{self.name}: нет ответа за {self.hedge_max_wait} с")
+            for future in done:
+                error = future.exception()
+                # исключение из ignore - тоже ответ API, дубль не ждем
+                if error is None or isinstance(error, self.ignore):
+                    if future is second and error is None:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+        raise error
+
+    def stats(self):
+        p95 = self.p95()
+        with self._lock:
+            outcomes = len(self._outcomes)
+            return {
+                'state': self.state,
+                'calls': self.calls,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'opened': self.opened,
+                'window_failure_rate': round(sum(1 for ok, _slow in self._outcomes if not ok) / outcomes, 3)
+                if outcomes else 0.0,
+                'window_slow_rate': round(sum(1 for _ok, slow in self._outcomes if slow) / outcomes, 3)
+                if outcomes else 0.0,
+                'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+                'late': self.late,
+            }
+
+def breaker_stats():
+    return {name: breaker.stats() for name, breaker in breakers.items()}
@@ -0,0 +1,112 @@
+'''
+Пул заранее загруженных случайных записей (утки, лисы) для task3.py.
+
+PrefetchPool хранит до size записей в кольцевом буфере (deque с maxlen).
+Фоновый поток пополняет его через loader не чаще refill_rate раз в секунду,
+а представление забирает готовую запись за O(1) и идет во внешний API
+напрямую только если пул пуст. Поток запускается при первом обращении к
+пулу, после ошибки загрузки ждет retry_delay секунд.
+
+stats() показывает заполненность пула и долю запросов, обслуженных из него.
+
+'''
+
+import threading
+import time
+from collections import deque
+
+class PrefetchPool:
+    def __init__(self, name, loader, size=16, refill_rate=5.0, retry_delay=1.0):
+        self.name = name
+        self.loader = loader
+        self.size = size
+        self.refill_rate = refill_rate
+        self.retry_delay = retry_delay
+
+        self._items = deque(maxlen=size)
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.errors = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None and self.size > 0:
+                self._thread = threading.Thread(target=self._refill_loop, name=f'prefetch-{self.name}', daemon=True)
+                self._thread.start()
+
+    def get(self):
+        self.start()
+        try:
+            item = self._items.popleft()
+        except IndexError:
+            with self._lock:
+                self.misses += 1
+            self._wakeup.set()
+            return self.loader()
+
+        with self._lock:
+            self.hits += 1
+        self._wakeup.set()
+        return item
+
+    def take(self, count):
+        # до count готовых записей без обращения к API, может вернуть меньше
+        self.start()
+        items = []
+        while len(items) < count:
+            try:
+                items.append(self._items.popleft())
+            except IndexError:
+                break
+
+        with self._lock:
+            self.hits += len(items)
+            self.misses += count - len(items)
+        self._wakeup.set()
+        return items
+
+    def _refill_loop(self):
+        interval = 1 / self.refill_rate if self.refill_rate else 0
+        while not self._stopped:
+            if len(self._items) >= self.size:
+                # пул полон - ждем, пока из него что-нибудь заберут
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            try:
+                item = self.loader()
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                time.sleep(self.retry_delay)
+                continue
+
+            self._items.append(item)
+            with self._lock:
+                self.refills += 1
+            if interval:
+                time.sleep(interval)
+
+    def stats(self):
+        with self._lock:
+            served = self.hits + self.misses
+            return {
+                'size': self.size,
+                'available': len(self._items),
+                'refill_rate': self.refill_rate,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / served, 3) if served else 0.0,
+                'refills': self.refills,
+                'errors': self.errors,
+            }
+
+    def close(self):
+        self._stopped = True
+        self._wakeup.set()
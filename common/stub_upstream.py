@@ -0,0 +1,88 @@
+'''
+Локальная заглушка внешних API для task3.py: отвечает так же, как
+random-d.uk (/api/random), randomfox.ca (/floof/) и jsonplaceholder
+(/albums/<id>/photos), но без сети и с настраиваемой задержкой ответа.
+
+    python common/stub_upstream.py --port 8900 --delay 0.2
+
+Адреса для task3.py - см. upstream.py.
+
+'''
+
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PHOTOS_RE = re.compile(r'^/albums/(\d+)/photos/?$')
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    requests_count = 0
+
+    def do_GET(self):
+        type(self).requests_count += 1
+        if self.delay:
+            time.sleep(self.delay)
+
+        base = f'http://{self.headers.get("Host", "127.0.0.1")}'
+        path = self.path.split('?')[0]
+        photos_match = PHOTOS_RE.match(path)
+
+        if path == '/api/random':
+            number = random.randint(1, 300)
+            data = {'url': f'{base}/api/{number}.jpg', 'message': 'Powered by stub'}
+        elif path == '/floof/':
+            number = random.randint(1, 120)
+            data = {'image': f'{base}/images/{number}.jpg', 'link': f'{base}/?i={number}'}
+        elif photos_match:
+            album_id = int(photos_match.group(1))
+            data = [
+                {
+                    'albumId': album_id,
+                    'id': (album_id - 1) * 50 + i,
+                    'title': f'photo {i}',
+                    'url': f'{base}/600/{i}',
+                    'thumbnailUrl': f'{base}/150/{i}',
+                }
+                for i in range(1, 51)
+            ]
+        else:
+            self.send_error(404)
+            return
+
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    # сотни одновременных подключений не должны упираться в backlog 5
+    request_queue_size = 1024
+    daemon_threads = True
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Заглушка random-d.uk, randomfox.ca и jsonplaceholder")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--delay', type=float, default=0.0, help="задержка каждого ответа, сек")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    StubHandler.delay = args.delay
+    # HTTP/1.1, чтобы клиенты могли держать keep-alive соединения
+    StubHandler.protocol_version = 'HTTP/1.1'
+    server = StubServer((args.host, args.port), StubHandler)
+    print(f"Заглушка API запущена на порту {args.port}...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Заглушка остановлена.")
@@ -0,0 +1,156 @@
+'''
+Тесты предохранителя и хеджирования common/breaker.py.
+
+    python -m pytest common
+
+'''
+
+import itertools
+import threading
+import time
+
+import pytest
+
+from common.breaker import CircuitBreaker, CircuitOpenError
+
+names = itertools.count()
+
+def make_breaker(**options):
+    options.setdefault('min_calls', 2)
+    options.setdefault('open_for', 0.1)
+    return CircuitBreaker(f'test-{next(names)}', **options)
+
+def fail():
+    raise OSError('upstream down')
+
+def call_failing(breaker, times=1):
+    for _ in range(times):
+        with pytest.raises(OSError):
+            breaker.call(fail)
+
+def test_opens_after_failures_and_rejects():
+    breaker = make_breaker()
+    call_failing(breaker, 2)
+    assert breaker.state == 'open'
+
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: 'ok')
+    assert breaker.stats()['rejected'] == 1
+
+def test_half_open_trial_closes_or_reopens():
+    breaker = make_breaker()
+    call_failing(breaker, 2)
+    time.sleep(0.15)
+    call_failing(breaker)
+    assert breaker.state == 'open'
+
+    time.sleep(0.15)
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == 'closed'
+
+def test_half_open_allows_one_trial_at_a_time():
+    breaker = make_breaker()
+    call_failing(breaker, 2)
+    time.sleep(0.15)
+
+    release = threading.Event()
+    trial = threading.Thread(target=breaker.call, args=(release.wait,))
+    trial.start()
+    time.sleep(0.05)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: 'ok')
+    release.set()
+    trial.join()
+    assert breaker.state == 'closed'
+
+def test_slow_calls_open():
+    breaker = make_breaker(slow_call=0.01)
+    for _ in range(2):
+        breaker.call(time.sleep, 0.02)
+    assert breaker.state == 'open'
+
+def test_ignored_errors_count_as_success():
+    breaker = make_breaker(ignore=(LookupError,))
+
+    def not_found():
+        raise LookupError('no such city')
+
+    for _ in range(3):
+        with pytest.raises(LookupError):
+            breaker.call(not_found)
+    assert breaker.state == 'closed'
+    assert breaker.stats()['failures'] == 0
+
+def test_late_outcome_does_not_reopen():
+    breaker = make_breaker()
+    release = threading.Event()
+
+    def slow_failure():
+        release.wait()
+        raise OSError('late')
+
+    late = threading.Thread(target=lambda: pytest.raises(OSError, breaker.call, slow_failure))
+    late.start()
+    call_failing(breaker, 2)
+    time.sleep(0.15)
+    breaker.call(lambda: 'ok')
+    assert breaker.state == 'closed'
+
+    release.set()
+    late.join()
+    assert breaker.state == 'closed'
+    assert breaker.stats()['late'] == 1
+
+def test_hedge_answers_when_first_attempt_fails():
+    breaker = make_breaker(min_calls=100, hedge_budget=1.0)
+    for _ in range(20):
+        breaker.call(lambda: 'ok', hedge=True)
+
+    attempts = itertools.count()
+
+    def flaky():
+        # первая попытка висит и падает, дубль отвечает сразу
+        if next(attempts) == 0:
+            time.sleep(0.1)
+            raise OSError('timeout')
+        return 'hedge'
+
+    assert breaker.call(flaky, hedge=True) == 'hedge'
+    assert breaker.stats()['hedged'] == 1
+    assert breaker.stats()['hedge_wins'] == 1
+
+def test_no_hedge_when_first_attempt_is_fast():
+    breaker = make_breaker(min_calls=100, hedge_budget=1.0)
+    for _ in range(20):
+        breaker.call(time.sleep, 0.01, hedge=True)
+
+    assert breaker.call(lambda: 'fast', hedge=True) == 'fast'
+    time.sleep(0.05)
+    assert breaker.stats()['hedged'] == 0
+
+def test_fast_hedge_beats_slow_primary():
+    breaker = make_breaker(min_calls=100, hedge_budget=1.0)
+    for _ in range(20):
+        breaker.call(lambda: 'ok', hedge=True)
+
+    attempts = itertools.count()
+
+    def slow_primary():
+        # первая попытка отвечает успешно, но через секунду
+        if next(attempts) == 0:
+            time.sleep(1.0)
+            return 'slow'
+        return 'hedge'
+
+    started = time.monotonic()
+    assert breaker.call(slow_primary, hedge=True) == 'hedge'
+    assert time.monotonic() - started < 0.5
+    assert breaker.stats()['hedge_wins'] == 1
+
+def test_hedged_wait_is_bounded():
+    breaker = make_breaker(min_calls=100, hedge_budget=0.0, hedge_max_wait=0.1)
+    for _ in range(20):
+        breaker.call(lambda: 'ok', hedge=True)
+
+    with pytest.raises(TimeoutError):
+        breaker.call(time.sleep, 0.5, hedge=True)
@@ -0,0 +1,131 @@
+'''
+Тесты common/upstream.py против локальной заглушки stub_upstream.py.
+
+    python -m pytest common
+
+'''
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from common import upstream as upstream_module
+from common.breaker import CircuitBreaker
+from common.prefetch import PrefetchPool
+from common.stub_upstream import StubHandler, StubServer
+from common.upstream import TTLCache, Upstream, UpstreamError
+
+@pytest.fixture
+def stub():
+    StubHandler.delay = 0.0
+    StubHandler.requests_count = 0
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def client(stub, monkeypatch):
+    client = Upstream()
+    monkeypatch.setattr(upstream_module, 'upstream', client)
+    monkeypatch.setattr(upstream_module, 'FOX_API_URL', stub)
+    monkeypatch.setattr(upstream_module, 'PHOTOS_API_URL', stub)
+    monkeypatch.setattr(upstream_module, 'fox_breaker', CircuitBreaker('test-fox'))
+    monkeypatch.setattr(upstream_module, 'photos_breaker', CircuitBreaker('test-photos'))
+    # пул без фонового потока: каждая лиса загружается из заглушки
+    monkeypatch.setattr(upstream_module, 'fox_pool', PrefetchPool('test-fox', upstream_module.fetch_fox, size=0))
+    yield client
+    client.close()
+
+def test_get_json(stub, client):
+    duck = client.get_json(f'{stub}/api/random')
+    assert duck['url'].startswith(stub)
+
+def test_get_json_error(stub, client):
+    with pytest.raises(UpstreamError):
+        client.get_json(f'{stub}/missing')
+
+def test_album_page_is_cached(client):
+    photos, pagination = upstream_module.album_page(2, page=2, per_page=10)
+    assert [photo['id'] for photo in photos] == list(range(61, 71))
+    assert pagination == {'page': 2, 'pages': 5, 'per_page': 10, 'total': 50}
+
+    upstream_module.album_page(2, page=5, per_page=10)
+    assert StubHandler.requests_count == 1
+    assert client.cache.stats()['hits'] == 1
+
+def test_random_foxes(client):
+    foxes = upstream_module.random_foxes(3)
+    assert 1 <= len(foxes) <= 3
+    assert len({fox['image'] for fox in foxes}) == len(foxes)
+
+def test_ttl_cache_coalesces_cold_misses():
+    calls = []
+    started = threading.Event()
+
+    def loader():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 'value'
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        cache = TTLCache(executor)
+        leader = executor.submit(cache.get, 'key', loader, 60)
+        started.wait(1)
+        followers = [executor.submit(cache.get, 'key', loader, 60) for _ in range(5)]
+        results = [leader.result()] + [future.result() for future in followers]
+
+    assert results == ['value'] * 6
+    assert len(calls) == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['coalesced'] == 5
+
+def test_ttl_cache_does_not_cache_errors():
+    def failing():
+        raise UpstreamError('down')
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        cache = TTLCache(executor)
+        with pytest.raises(UpstreamError):
+            cache.get('key', failing, 60)
+        assert cache.get('key', lambda: 'value', 60) == 'value'
+
+def test_random_foxes_respects_deadline(client, monkeypatch):
+    StubHandler.delay = 1.0
+    executor = ThreadPoolExecutor(max_workers=3)
+    monkeypatch.setattr(upstream_module, 'fox_executor', executor)
+    assert upstream_module.random_foxes(3, deadline=0.3) == []
+    # загрузки не переживают срок, и потоки освобождаются для следующих запросов
+    assert executor.submit(lambda: 'free').result(timeout=0.4) == 'free'
+    executor.shutdown(wait=False)
+
+def test_check_fox_rejects_payload_without_image():
+    assert upstream_module.check_fox({'image': 'x.jpg'}) == {'image': 'x.jpg'}
+    for payload in ({}, {'image': None}, ['x.jpg']):
+        with pytest.raises(UpstreamError):
+            upstream_module.check_fox(payload)
+
+def test_ttl_cache_is_bounded():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        cache = TTLCache(executor, max_entries=3)
+        for key in range(10):
+            cache.get(key, lambda: [], 60)
+        assert cache.stats()['entries'] == 3
+        assert cache.stats()['evicted'] == 7
+
+        # недавно прочитанная запись вытесняется последней
+        cache.get(7, lambda: 'reloaded', 60)
+        cache.get(10, lambda: [], 60)
+        assert cache.get(7, lambda: 'reloaded', 60) == []
+
+def test_ttl_cache_drops_expired_entries():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        cache = TTLCache(executor, max_entries=100)
+        cache.get('old', lambda: 'value', 0)
+        cache.get('new', lambda: 'value', 60)
+        assert cache.stats()['entries'] == 1
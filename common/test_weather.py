@@ -0,0 +1,78 @@
+'''
+Тесты кеша погоды common/weather.py с FakeWeatherBackend.
+
+    python -m pytest common
+
+'''
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from common.breaker import CircuitBreaker
+from common.weather import FakeWeatherBackend, WeatherCache, create_backend, normalize_city
+
+def test_fake_backend():
+    backend = FakeWeatherBackend(unknown=['Atlantis'])
+    weather = backend.fetch('Minsk')
+    assert weather['city'] == 'Minsk'
+    assert weather['temp_feels'] == weather['temp'] - 2
+    with pytest.raises(LookupError):
+        backend.fetch('  atlantis ')
+    assert backend.calls == 2
+
+def test_create_backend_fake(monkeypatch):
+    monkeypatch.setenv('WEATHER_BACKEND', 'fake')
+    assert isinstance(create_backend(owm=None), FakeWeatherBackend)
+
+def test_normalize_city():
+    assert normalize_city('  new   York ') == normalize_city('New York')
+
+def test_cache_hits():
+    backend = FakeWeatherBackend()
+    cache = WeatherCache(backend, ttl=60)
+    assert cache.get('Minsk') == cache.get('  minsk ')
+    assert backend.calls == 1
+    assert cache.stats()['hits'] == 1
+
+def test_expired_entries_are_reloaded():
+    backend = FakeWeatherBackend()
+    cache = WeatherCache(backend, ttl=0)
+    cache.get('Minsk')
+    cache.get('Minsk')
+    assert backend.calls == 2
+
+def test_concurrent_misses_share_one_fetch():
+    backend = FakeWeatherBackend(delay=0.2)
+    cache = WeatherCache(backend, ttl=60)
+    start = threading.Barrier(8)
+
+    def get():
+        start.wait()
+        return cache.get('Minsk')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = [future.result() for future in [executor.submit(get) for _ in range(8)]]
+
+    assert all(result == results[0] for result in results)
+    assert backend.calls == 1
+    assert cache.stats()['coalesced'] == 7
+
+def test_errors_are_not_cached():
+    backend = FakeWeatherBackend(unknown=['Atlantis'])
+    cache = WeatherCache(backend, ttl=60)
+    for _ in range(2):
+        with pytest.raises(LookupError):
+            cache.get('Atlantis')
+    assert backend.calls == 2
+    assert cache.stats()['entries'] == 0
+
+def test_unknown_city_does_not_open_breaker():
+    breaker = CircuitBreaker('test-weather', min_calls=2, ignore=(LookupError,))
+    cache = WeatherCache(FakeWeatherBackend(unknown=['Atlantis']), ttl=60, breaker=breaker)
+    for _ in range(3):
+        with pytest.raises(LookupError):
+            cache.get('Atlantis')
+    assert breaker.state == 'closed'
+    assert cache.get('Minsk')['city'] == 'Minsk'
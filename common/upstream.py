@@ -0,0 +1,297 @@
+'''
+Общий слой запросов к внешним API для task3.py (homework3 и homework4_5_6) (random-d.uk, randomfox.ca,
+jsonplaceholder).
+
+Все запросы идут через один requests.Session с пулом keep-alive соединений,
+поэтому TCP и TLS рукопожатие не повторяется на каждый просмотр страницы, и
+у каждого запроса есть таймауты на подключение и на чтение ответа.
+
+Ответы, которые меняются редко (фотографии альбома), кешируются на ttl
+секунд. После этого еще stale_ttl секунд отдается старое значение, а свежее
+загружается в фоне (stale-while-revalidate) - страница не ждет внешний API.
+Одновременные промахи по одному ключу ждут один и тот же запрос
+(single-flight), а не делают каждый свой. Кеш ограничен CACHE_MAX_ENTRIES
+записями (LRU): ключи приходят из URL (номер альбома), и без предела любой
+клиент мог бы раздуть память. При добавлении записи вытесняются самые
+давно использованные, а также устаревшие записи в начале очереди.
+
+Альбом кешируется целиком один раз, а страницы (album_page) - срезы этого
+списка, так что листание не делает новых запросов к API.
+
+Случайные утки и лисы берутся из пулов PrefetchPool (prefetch.py), которые
+фоновые потоки заранее наполняют; размер пулов и частота пополнения задаются
+переменными DUCK_POOL_SIZE, FOX_POOL_SIZE и PREFETCH_RATE. Если лис нужно
+несколько (random_foxes), недостающие загружаются параллельно, с общим
+сроком FOX_DEADLINE секунд: что успело загрузиться, то и показывается, а
+одинаковые картинки отбрасываются. Таймаут каждой такой загрузки не больше
+оставшегося срока, поэтому запрос не держит поток fox_executor (FOX_WORKERS
+потоков на весь процесс) дольше своего срока и не отнимает его у других.
+Ответ лисьего API без строки image считается ошибкой API.
+
+У каждого API свой предохранитель (breaker.py): если API начинает отвечать
+ошибками или слишком медленно, запросы к нему какое-то время сразу
+завершаются ошибкой, и страницы показывают заглушки, а не держат потоки
+в ожидании таймаута. Запрос, не получивший ответа за p95 обычного времени,
+дублируется (хеджирование).
+
+Адреса API берутся из переменных окружения, так что приложение можно
+запустить против локальной заглушки common/stub_upstream.py:
+
+    python common/stub_upstream.py --port 8900
+    DUCK_API_URL=http://127.0.0.1:8900/api FOX_API_URL=http://127.0.0.1:8900 \
+        PHOTOS_API_URL=http://127.0.0.1:8900 python task3.py
+
+'''
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.breaker import CircuitBreaker, CircuitOpenError, breaker_stats
+from common.prefetch import PrefetchPool
+
+DUCK_API_URL = os.environ.get('DUCK_API_URL', 'https://random-d.uk/api')
+FOX_API_URL = os.environ.get('FOX_API_URL', 'https://randomfox.ca')
+PHOTOS_API_URL = os.environ.get('PHOTOS_API_URL', 'https://jsonplaceholder.typicode.com')
+
+CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 2))
+READ_TIMEOUT = float(os.environ.get('UPSTREAM_READ_TIMEOUT', 5))
+POOL_SIZE = 20
+CACHE_MAX_ENTRIES = int(os.environ.get('UPSTREAM_CACHE_MAX_ENTRIES', 256))
+
+PHOTOS_TTL = 300
+PHOTOS_STALE_TTL = 3600
+PHOTOS_PER_PAGE = 12
+MAX_PER_PAGE = 100
+
+DUCK_POOL_SIZE = int(os.environ.get('DUCK_POOL_SIZE', 16))
+FOX_POOL_SIZE = int(os.environ.get('FOX_POOL_SIZE', 32))
+PREFETCH_RATE = float(os.environ.get('PREFETCH_RATE', 5))
+
+FOX_DEADLINE = float(os.environ.get('FOX_DEADLINE', 3))
+FOX_WORKERS = int(os.environ.get('FOX_WORKERS', 10))
+
+class UpstreamError(Exception):
+    pass
+
+class TTLCache:
+    def __init__(self, executor, max_entries=CACHE_MAX_ENTRIES):
+        self._executor = executor
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evicted = 0
+
+    def get(self, key, loader, ttl, stale_ttl=0):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, loaded_at, _keep_until = entry
+                age = now - loaded_at
+                if age < ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if age < ttl + stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._executor.submit(self._refresh, key, loader, ttl, stale_ttl)
+                    return value
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._put_locked(key, value, ttl, stale_ttl)
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def _put_locked(self, key, value, ttl, stale_ttl):
+        now = time.monotonic()
+        self._entries[key] = (value, now, now + ttl + stale_ttl)
+        self._entries.move_to_end(key)
+        while self._entries:
+            oldest_key, (_value, _loaded_at, keep_until) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and keep_until > now:
+                break
+            del self._entries[oldest_key]
+            self.evicted += 1
+
+    def _refresh(self, key, loader, ttl, stale_ttl):
+        try:
+            value = loader()
+        except (UpstreamError, CircuitOpenError):
+            # оставляем старое значение, попробуем при следующем запросе
+            return
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+        with self._lock:
+            self._put_locked(key, value, ttl, stale_ttl)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evicted': self.evicted,
+            }
+
+class Upstream:
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, pool_size=POOL_SIZE):
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='upstream-refresh')
+        self.cache = TTLCache(self._executor)
+
+    def get_json(self, url, breaker=None, timeout=None, **params):
+        if breaker is not None:
+            # запросы только на чтение, поэтому их можно безопасно дублировать
+            return breaker.call(lambda: self.get_json(url, timeout=timeout, **params), hedge=True)
+
+        if timeout is not None:
+            timeout = tuple(min(limit, timeout) for limit in self.timeout)
+        try:
+            response = self.session.get(url, params=params or None, timeout=timeout or self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise UpstreamError(f"{url}: {e}") from e
+
+    def cached_json(self, url, ttl, stale_ttl=0, breaker=None, **params):
+        key = (url, tuple(sorted(params.items())))
+        return self.cache.get(key, lambda: self.get_json(url, breaker, **params), ttl, stale_ttl)
+
+    def stats(self):
+        return {'cache': self.cache.stats()}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+upstream = Upstream()
+
+duck_breaker = CircuitBreaker('duck')
+fox_breaker = CircuitBreaker('fox')
+photos_breaker = CircuitBreaker('photos')
+
+def fetch_duck():
+    return upstream.get_json(f'{DUCK_API_URL}/random', duck_breaker)
+
+def check_fox(fox):
+    if not isinstance(fox, dict) or not isinstance(fox.get('image'), str):
+        raise UpstreamError(f"{FOX_API_URL}/floof/: в ответе нет image")
+    return fox
+
+def fetch_fox(deadline_at=None):
+    timeout = None
+    if deadline_at is not None:
+        timeout = deadline_at - time.monotonic()
+        if timeout <= 0:
+            # задача дождалась потока уже после срока запроса
+            raise UpstreamError(f"{FOX_API_URL}/floof/: срок запроса истек")
+    return check_fox(upstream.get_json(f'{FOX_API_URL}/floof/', fox_breaker, timeout))
+
+duck_pool = PrefetchPool('duck', fetch_duck, DUCK_POOL_SIZE, PREFETCH_RATE)
+fox_pool = PrefetchPool('fox', fetch_fox, FOX_POOL_SIZE, PREFETCH_RATE)
+
+def random_duck():
+    return duck_pool.get()
+
+def random_fox():
+    return fox_pool.get()
+
+fox_executor = ThreadPoolExecutor(max_workers=FOX_WORKERS, thread_name_prefix='fox-fetch')
+
+def random_foxes(count, deadline=FOX_DEADLINE):
+    deadline_at = time.monotonic() + deadline
+    foxes = {}
+    for fox in fox_pool.take(count):
+        foxes.setdefault(fox['image'], fox)
+
+    attempts = 0
+    while len(foxes) < count and attempts < count * 2:
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            break
+
+        futures = [fox_executor.submit(fetch_fox, deadline_at) for _ in range(count - len(foxes))]
+        attempts += len(futures)
+        done, not_done = wait(futures, timeout=remaining)
+        for future in not_done:
+            future.cancel()
+
+        loaded = [future.result() for future in done if future.exception() is None]
+        for fox in loaded:
+            foxes.setdefault(fox['image'], fox)
+        # срок вышел или API не отвечает - отдаем то, что есть
+        if not_done or not loaded:
+            break
+
+    return list(foxes.values())[:count]
+
+def album_photos(album_id=1):
+    return upstream.cached_json(f'{PHOTOS_API_URL}/albums/{album_id}/photos', PHOTOS_TTL, PHOTOS_STALE_TTL,
+                                photos_breaker)
+
+def paginate(items, page=1, per_page=PHOTOS_PER_PAGE):
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    pages = max(1, -(-len(items) // per_page))
+    page = max(1, min(page, pages))
+    start = (page - 1) * per_page
+    pagination = {
+        'page': page,
+        'pages': pages,
+        'per_page': per_page,
+        'total': len(items),
+    }
+    return items[start:start + per_page], pagination
+
+def album_page(album_id=1, page=1, per_page=PHOTOS_PER_PAGE):
+    return paginate(album_photos(album_id), page, per_page)
+
+def upstream_stats():
+    return dict(upstream.stats(), pools={
+        'duck': duck_pool.stats(),
+        'fox': fox_pool.stats(),
+    }, breakers=breaker_stats())
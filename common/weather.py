@@ -0,0 +1,137 @@
+'''
+Кеш погоды для task3.py.
+
+Погода в OWM для текущих наблюдений обновляется примерно раз в 10 минут,
+поэтому ответ для города хранится WEATHER_TTL секунд: серия одинаковых
+запросов к /weather-minsk/ превращается в один запрос к OWM. Ключ - название
+города без лишних пробелов и без учета регистра ("  minsk" и "Minsk" - одна
+запись).
+
+Если несколько запросов одновременно спрашивают город, которого нет в кеше,
+к OWM идет только первый, остальные ждут его результат (single-flight).
+Ошибки не кешируются. Запросы к OWM можно пропустить через предохранитель
+(breaker.py): пока OWM отвечает ошибками или медленно, промахи кеша сразу
+завершаются ошибкой. "Город не найден" (LookupError) отказом OWM не
+считается.
+
+Бэкенд выбирается переменной WEATHER_BACKEND: по умолчанию OWM, а
+WEATHER_BACKEND=fake - FakeWeatherBackend без сети (для тестов и нагрузки).
+
+'''
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from pyowm.commons.exceptions import NotFoundError
+
+WEATHER_TTL = int(os.environ.get('WEATHER_TTL', 600))
+
+def normalize_city(city):
+    return ' '.join(city.split()).casefold()
+
+class OWMBackend:
+    def __init__(self, owm):
+        # weather_manager создается один раз, а не на каждый запрос
+        self.weather_manager = owm.weather_manager()
+
+    def fetch(self, city):
+        try:
+            weather = self.weather_manager.weather_at_place(city).weather
+        except NotFoundError as e:
+            raise LookupError(f"Город не найден: {city}") from e
+        temperature = weather.temperature('celsius')
+        return {
+            'city': city,
+            'status': weather.detailed_status,
+            'temp': temperature['temp'],
+            'temp_feels': temperature['feels_like'],
+        }
+
+class FakeWeatherBackend:
+    def __init__(self, delay=0.0, unknown=()):
+        self.delay = delay
+        self.unknown = {normalize_city(city) for city in unknown}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, city):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if normalize_city(city) in self.unknown:
+            raise LookupError(f"Город не найден: {city}")
+
+        temp = float(len(city) % 30)
+        return {
+            'city': city,
+            'status': 'облачно',
+            'temp': temp,
+            'temp_feels': temp - 2,
+        }
+
+def create_backend(owm):
+    if os.environ.get('WEATHER_BACKEND') == 'fake':
+        return FakeWeatherBackend()
+    return OWMBackend(owm)
+
+class WeatherCache:
+    def __init__(self, backend, ttl=WEATHER_TTL, breaker=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.breaker = breaker
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, city):
+        key = normalize_city(city)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[0]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            if self.breaker is not None:
+                value = self.breaker.call(self.backend.fetch, city, hedge=True)
+            else:
+                value = self.backend.fetch(city)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+            }
@@ -0,0 +1,117 @@
+"""
+
+Кадрирование сообщений протокола command:reg / command:signin.
+
+Каждое сообщение передается кадром: 4 байта длины (big-endian) + текст в
+UTF-8. Так одно соединение может нести сколько угодно команд, в том числе
+отправленных пачкой без ожидания ответов (pipelining): сервер отвечает
+кадрами в том же порядке.
+
+Длина кадра ограничена MAX_FRAME_SIZE (< 16 МБ), поэтому первый байт кадра
+всегда нулевой. Старый формат (одна команда без заголовка на соединение)
+начинается с "command:", а HTTP - с имени метода, так что сервер различает
+форматы по первому байту.
+
+
+"""
+
+import asyncio
+import socket
+import struct
+
+HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 1024 * 1024
+
+def is_framed(first_bytes):
+    return first_bytes[:1] == b'\x00'
+
+def encode_frame(text):
+    payload = text.encode('utf-8')
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ValueError(f"Слишком большое сообщение: {len(payload)} байт")
+    return HEADER.pack(len(payload)) + payload
+
+def decode_length(header):
+    (length,) = HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Слишком большой кадр: {length} байт")
+    return length
+
+def recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            if chunks:
+                raise ConnectionError("Соединение закрыто посреди кадра")
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def read_frame(sock):
+    header = recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+
+    length = decode_length(header)
+    payload = recv_exact(sock, length) if length else b''
+    if payload is None:
+        raise ConnectionError("Соединение закрыто посреди кадра")
+    return payload.decode('utf-8')
+
+async def read_frame_async(reader, prefix=b''):
+    try:
+        header = prefix + await reader.readexactly(HEADER.size - len(prefix))
+    except asyncio.IncompleteReadError as e:
+        if prefix or e.partial:
+            raise ConnectionError("Соединение закрыто посреди кадра")
+        return None
+
+    length = decode_length(header)
+    payload = await reader.readexactly(length)
+    return payload.decode('utf-8')
+
+class FrameDecoder:
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        self._buffer += data
+        messages = []
+        while len(self._buffer) >= HEADER.size:
+            length = decode_length(self._buffer[:HEADER.size])
+            end = HEADER.size + length
+            if len(self._buffer) < end:
+                break
+            messages.append(self._buffer[HEADER.size:end].decode('utf-8'))
+            del self._buffer[:end]
+        return messages
+
+class FramedConnection:
+    def __init__(self, host, port, timeout=None):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+
+    def send(self, command):
+        self.sock.sendall(encode_frame(command))
+        return read_frame(self.sock)
+
+    def pipeline(self, commands, window=128):
+        # команды уходят окнами, чтобы буферы сокетов не переполнились
+        # с обеих сторон одновременно
+        commands = list(commands)
+        responses = []
+        for start in range(0, len(commands), window):
+            chunk = commands[start:start + window]
+            self.sock.sendall(b''.join(encode_frame(command) for command in chunk))
+            responses.extend(read_frame(self.sock) for _command in chunk)
+        return responses
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,121 @@
+"""
+
+Хеширование паролей для серверов homework2.
+
+Пароли хранятся как "scrypt$<n>$<r>$<p>$<salt>$<hash>" (соль и хеш в hex).
+scrypt специально медленный, поэтому хеширование и проверка выполняются в
+пуле процессов HashPool: асинхронный сервер ждет результат через await и
+продолжает принимать соединения, пока считаются хеши. HashPool.stats()
+возвращает задержку хеширования (от постановки в очередь до результата) и
+текущую глубину очереди.
+
+Процессы пула запускаются через forkserver, а не обычным fork: пул
+создается при первом запросе, когда у сервера уже открыты слушающий и
+клиентский сокеты, и при fork процессы пула унаследовали бы их (клиент не
+получил бы EOF, а после остановки сервера порт остался бы занятым).
+
+
+"""
+
+import asyncio
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_SIZE = 16
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    salt = os.urandom(SALT_SIZE)
+    digest = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p)
+    return f"scrypt${n}${r}${p}${salt.hex()}${digest.hex()}"
+
+def verify_password(password, encoded):
+    try:
+        algorithm, n, r, p, salt, expected = encoded.split('$')
+        if algorithm != 'scrypt':
+            return False
+        digest = hashlib.scrypt(password.encode('utf-8'), salt=bytes.fromhex(salt),
+                                n=int(n), r=int(r), p=int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest.hex(), expected)
+
+class HashPool:
+    def __init__(self, workers=None, n=SCRYPT_N, latency_window=1000):
+        self.workers = workers
+        self.n = n
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queue_depth = 0
+        self._completed = 0
+        self._latencies = deque(maxlen=latency_window)
+
+    def _submit(self, function, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('forkserver'))
+            self._queue_depth += 1
+
+        started = time.perf_counter()
+        future = self._executor.submit(function, *args)
+
+        def done(_future):
+            with self._lock:
+                self._queue_depth -= 1
+                self._completed += 1
+                self._latencies.append(time.perf_counter() - started)
+
+        future.add_done_callback(done)
+        return future
+
+    def hash_sync(self, passwords):
+        futures = [self._submit(hash_password, password, self.n) for password in passwords]
+        return [future.result() for future in futures]
+
+    def verify_sync(self, pairs):
+        futures = [self._submit(verify_password, password, encoded) for password, encoded in pairs]
+        return [future.result() for future in futures]
+
+    async def hash(self, passwords):
+        futures = [asyncio.wrap_future(self._submit(hash_password, password, self.n))
+                   for password in passwords]
+        return await asyncio.gather(*futures)
+
+    async def verify(self, pairs):
+        futures = [asyncio.wrap_future(self._submit(verify_password, password, encoded))
+                   for password, encoded in pairs]
+        return await asyncio.gather(*futures)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            queue_depth = self._queue_depth
+            completed = self._completed
+
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 2)
+
+        return {
+            'queue_depth': queue_depth,
+            'completed': completed,
+            'latency_ms': {
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': percentile(1.0),
+            },
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
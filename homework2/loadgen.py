@@ -0,0 +1,295 @@
+"""
+
+Генератор нагрузки для серверов homework2 (task1 и task2).
+
+Виртуальные клиенты (--clients) выполняют смесь запросов (--mix):
+    reg     - command:reg по постоянному соединению с кадрами
+    signin  - command:signin для пользователя, которого этот клиент уже
+              зарегистрировал
+    http    - GET одного из путей --paths (страницы task2)
+    static  - GET одного из файлов --static (статика task2)
+
+Закрытый цикл (--loop closed): каждый клиент отправляет следующий запрос
+сразу после ответа на предыдущий (плюс --think секунд), так что нагрузка
+подстраивается под скорость сервера.
+
+Открытый цикл (--loop open): запросы приходят с постоянной частотой --rate
+в секунду независимо от ответов, клиенты только их выполняют. Задержка
+считается от запланированного момента отправки, поэтому ожидание в очереди
+при перегруженном сервере тоже попадает в p99.
+
+Результат - JSON с p50/p95/p99, пропускной способностью и долей ошибок в
+целом и по каждому виду запросов; его удобно сохранять (--output) и
+сравнивать между версиями серверов.
+
+    python loadgen.py --command-port 12345 --mix reg=1,signin=3 --duration 10
+    python loadgen.py --command-port 8000 --http-port 8000 --loop open --rate 500
+
+
+"""
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from framing import FramedConnection
+
+HOST = '127.0.0.1'
+MIX = 'reg=1,signin=2,http=4,static=1'
+PATHS = ['/', '/test/1/', '/message/loadgen/hello/']
+STATIC = ['/text.txt']
+PASSWORD = 'Passw0rd123'
+TIMEOUT = 5.0
+
+# признаки успешного ответа task1 и task2, любой другой ответ - ошибка
+REG_OK = ('The user is registered!', 'зарегистрирован')
+SIGNIN_OK = ('The user is logged in!', 'произведен вход')
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ('reg', 'signin', 'http', 'static'):
+            raise ValueError(f"Неизвестный вид запроса: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentile(latencies, fraction):
+    if not latencies:
+        return 0.0
+    return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 2)
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        'requests': total,
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'throughput': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': percentile(latencies, 0.5),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': percentile(latencies, 1.0),
+        },
+    }
+
+class VirtualClient:
+    def __init__(self, client_id, args):
+        self.client_id = client_id
+        self.args = args
+        self.random = random.Random(client_id)
+        self.logins = []
+        self.counter = 0
+        self._command = None
+        self._http = None
+
+    def command(self, text, expected):
+        if self._command is None:
+            self._command = FramedConnection(self.args.command_host, self.args.command_port, TIMEOUT)
+        try:
+            response = self._command.send(text)
+        except OSError:
+            self.close()
+            raise
+        if response is None:
+            self.close()
+            raise ConnectionError("Сервер закрыл соединение")
+        if not any(marker in response for marker in expected):
+            raise ValueError(response)
+        return response
+
+    def get(self, path):
+        if self._http is None:
+            self._http = http.client.HTTPConnection(self.args.http_host, self.args.http_port, timeout=TIMEOUT)
+        try:
+            self._http.request('GET', path)
+            response = self._http.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self._http.close()
+            self._http = None
+            raise
+        if response.will_close:
+            self._http.close()
+            self._http = None
+        if response.status >= 400:
+            raise ValueError(f"HTTP {response.status}")
+
+    def reg(self):
+        self.counter += 1
+        login = f"{self.args.prefix}{self.client_id}x{self.counter}"
+        self.command(f"command:reg; login:{login}; password:{PASSWORD}", REG_OK)
+        self.logins.append(login)
+
+    def signin(self):
+        if not self.logins:
+            # входить пока некем - сначала регистрируем пользователя
+            self.reg()
+        login = self.random.choice(self.logins)
+        self.command(f"command:signin; login:{login}; password:{PASSWORD}", SIGNIN_OK)
+
+    def http(self):
+        self.get(self.random.choice(self.args.paths))
+
+    def static(self):
+        self.get(self.random.choice(self.args.static))
+
+    def close(self):
+        if self._command is not None:
+            self._command.close()
+            self._command = None
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+
+class Recorder:
+    def __init__(self, operations):
+        self._lock = threading.Lock()
+        self.latencies = {name: [] for name in operations}
+        self.errors = {name: 0 for name in operations}
+        self.error_samples = {}
+
+    def add(self, operation, latency, error=None):
+        with self._lock:
+            if error is None:
+                self.latencies[operation].append(latency)
+            else:
+                self.errors[operation] += 1
+                self.error_samples.setdefault(operation, repr(error))
+
+    def report(self, elapsed):
+        with self._lock:
+            operations = {
+                name: summarize(self.latencies[name], self.errors[name], elapsed)
+                for name in self.latencies
+            }
+            latencies = [latency for values in self.latencies.values() for latency in values]
+            total = summarize(latencies, sum(self.errors.values()), elapsed)
+            return {'total': total, 'operations': operations, 'error_samples': dict(self.error_samples)}
+
+def execute(client, operation, recorder, started):
+    try:
+        getattr(client, operation)()
+    except (OSError, ValueError, http.client.HTTPException) as e:
+        recorder.add(operation, time.perf_counter() - started, e)
+    else:
+        recorder.add(operation, time.perf_counter() - started)
+
+def closed_loop(client, choose, recorder, deadline, think):
+    while time.perf_counter() < deadline:
+        execute(client, choose(client.random), recorder, time.perf_counter())
+        if think:
+            time.sleep(think)
+
+def open_loop_worker(client, tasks, recorder):
+    while (task := tasks.get()) is not None:
+        scheduled, operation = task
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        execute(client, operation, recorder, scheduled)
+
+def run(args):
+    mix = parse_mix(args.mix)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    def choose(rng):
+        return rng.choices(names, weights)[0]
+
+    recorder = Recorder(names)
+    clients = [VirtualClient(client_id, args) for client_id in range(args.clients)]
+    started = time.perf_counter()
+    deadline = started + args.duration
+
+    if args.loop == 'closed':
+        threads = [
+            threading.Thread(target=closed_loop, args=(client, choose, recorder, deadline, args.think))
+            for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+    else:
+        # очередь ограничена, чтобы при отставании клиентов не копить
+        # бесконечно много запланированных запросов
+        tasks = queue.Queue(maxsize=args.clients * 16)
+        threads = [
+            threading.Thread(target=open_loop_worker, args=(client, tasks, recorder))
+            for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+
+        rng = random.Random(args.seed)
+        interval = 1.0 / args.rate
+        scheduled = started
+        while scheduled < deadline:
+            tasks.put((scheduled, choose(rng)))
+            scheduled += interval
+        for _thread in threads:
+            tasks.put(None)
+
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    for client in clients:
+        client.close()
+
+    report = recorder.report(elapsed)
+    report['config'] = {
+        'loop': args.loop,
+        'clients': args.clients,
+        'rate': args.rate if args.loop == 'open' else None,
+        'duration': round(elapsed, 3),
+        'mix': mix,
+    }
+    return report
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Генератор нагрузки для серверов homework2")
+    parser.add_argument('--command-host', default=HOST)
+    parser.add_argument('--command-port', type=int, default=8000,
+                        help="порт команд reg/signin (task1 - 12345, task2 - 8000)")
+    parser.add_argument('--http-host', default=HOST)
+    parser.add_argument('--http-port', type=int, default=8000)
+    parser.add_argument('--clients', type=int, default=16, help="число виртуальных клиентов")
+    parser.add_argument('--mix', default=MIX, help="веса запросов, например reg=1,signin=3,http=4")
+    parser.add_argument('--paths', nargs='+', default=PATHS)
+    parser.add_argument('--static', nargs='+', default=STATIC)
+    parser.add_argument('--loop', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--rate', type=float, default=200.0, help="запросов в секунду для --loop open")
+    parser.add_argument('--think', type=float, default=0.0, help="пауза клиента между запросами, сек")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--prefix', default=f"lg{os.getpid()}",
+                        help="префикс логинов, чтобы повторные запуски не пересекались")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="файл для JSON-отчета (по умолчанию stdout)")
+    args = parser.parse_args()
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.loop == 'open' and args.rate <= 0:
+        parser.error("--rate должен быть больше нуля")
+    return args
+
+def main():
+    args = parse_args()
+    report = json.dumps(run(args), ensure_ascii=False, indent=2)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(report + '\n')
+    else:
+        print(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+
+Режим prefork для серверов homework2 (task1 и task2).
+
+Главный процесс (supervisor) запускает workers дочерних процессов через
+fork. Каждый из них сам открывает слушающий сокет с SO_REUSEPORT на одном и
+том же порту, и ядро распределяет новые подключения между ними, поэтому
+сервер использует несколько ядер без общего accept. Каждый обработчик -
+лидер своей группы процессов.
+
+Если процесс-обработчик упал, supervisor запускает вместо него новый с тем
+же номером (если падения идут подряд - с паузой restart_delay), а оставшиеся
+после него процессы его группы завершаются. По SIGTERM или SIGINT supervisor
+рассылает SIGTERM всем обработчикам и ждет их завершения; в обработчиках
+SIGTERM превращается в KeyboardInterrupt, так что блоки finally (закрытие
+хранилища и т.п.) выполняются.
+
+Состояние, которое должно быть общим, нужно хранить вне процессов - для
+пользователей это SqliteStore из storage.py.
+
+
+"""
+
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+RESTART_DELAY = 1.0
+MIN_UPTIME = 1.0
+
+def create_reuseport_socket(host, port, backlog):
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    server_socket.bind((host, port))
+    server_socket.listen(backlog)
+    return server_socket
+
+def spawn_worker(target, worker_id):
+    # иначе недописанный буфер stdout достанется и дочернему процессу
+    sys.stdout.flush()
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # код дочернего процесса: обработчики сигналов supervisor'а здесь не нужны,
+    # а своя группа процессов позволяет убрать и его потомков (пул хеширования)
+    os.setpgid(0, 0)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    exit_code = 0
+    try:
+        target(worker_id)
+    except KeyboardInterrupt:
+        pass
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    os._exit(exit_code)
+
+def stop_workers(children):
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+def kill_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def run_prefork(target, workers, restart_delay=RESTART_DELAY):
+    children = {}
+    stopping = False
+
+    def stop(signum, frame):
+        # os.wait после обработчика продолжится сам, поэтому обработчики
+        # останавливаются здесь, а цикл ниже дождется их завершения
+        nonlocal stopping
+        stopping = True
+        stop_workers(children)
+
+    previous_handlers = {
+        signum: signal.signal(signum, stop) for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+
+    try:
+        for worker_id in range(workers):
+            children[spawn_worker(target, worker_id)] = (worker_id, time.monotonic())
+        print(f"Запущено процессов-обработчиков: {workers}")
+
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+
+            worker_id, started = children.pop(pid)
+            kill_group(pid)
+            if stopping:
+                continue
+
+            print(f"Процесс {worker_id} (pid {pid}) завершился с кодом "
+                  f"{os.waitstatus_to_exitcode(status)}, перезапуск...")
+            if time.monotonic() - started < MIN_UPTIME:
+                time.sleep(restart_delay)
+            if not stopping:
+                children[spawn_worker(target, worker_id)] = (worker_id, time.monotonic())
+    finally:
+        stop_workers(children)
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
@@ -0,0 +1,374 @@
+"""
+
+Хранилище учетных записей для серверов homework2 (task1 и task2).
+
+    MemoryStore - словарь в памяти (поведение по умолчанию, данные теряются
+                  при перезапуске)
+
+    LogStore    - данные на диске в формате "снимок + журнал":
+        CURRENT            - манифест: текущий снимок и список журналов
+        snapshot-<gen>.log - все записи на момент снимка, по одной JSON-строке
+        snapshot-<gen>.idx - индекс снимка {login: [offset, length]}
+        wal-<gen>.log      - записи, добавленные после снимка
+
+        В памяти хранится только индекс login -> (файл, смещение, длина),
+        поэтому поиск при входе - O(1): словарь + один pread. Прочитанные
+        записи кешируются в LRU-кеше. Новые записи копятся в буфере и
+        фоновым потоком пачками пишутся в журнал с одним fsync на пачку
+        (при падении теряется не больше flush_interval секунд записей).
+        Когда в журнале набирается snapshot_every записей, создается новое
+        поколение снимка, поэтому при запуске читается индекс снимка и
+        только хвост журнала, а не вся история.
+
+    SqliteStore - файл SQLite (путь оканчивается на .db или .sqlite).
+        В отличие от LogStore его могут одновременно использовать несколько
+        процессов (режим prefork): журнал WAL позволяет читать во время
+        записи, а уникальность логина проверяет сама база.
+
+
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+class MemoryStore:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, login):
+        with self._lock:
+            return self._data.get(login)
+
+    def add(self, login, record):
+        with self._lock:
+            if login in self._data:
+                return False
+            self._data[login] = dict(record, login=login)
+            return True
+
+    def add_many(self, items):
+        results = []
+        with self._lock:
+            for login, record in items:
+                if login in self._data:
+                    results.append(False)
+                else:
+                    self._data[login] = dict(record, login=login)
+                    results.append(True)
+        return results
+
+    def __contains__(self, login):
+        with self._lock:
+            return login in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def close(self):
+        pass
+
+class LogStore:
+    def __init__(self, directory, cache_size=10000, flush_interval=0.05, snapshot_every=10000):
+        self.directory = directory
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+
+        self._lock = threading.Lock()
+        self._index = {}
+        self._files = {}
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._buffer = []
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='logstore-flush', daemon=True)
+        self._flusher.start()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _open(self, name):
+        fd = os.open(self._path(name), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        self._files[name] = fd
+        return fd
+
+    def _load(self):
+        try:
+            with open(self._path('CURRENT'), encoding='utf-8') as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            manifest = {'generation': 0, 'snapshot': None, 'wals': ['wal-0.log']}
+
+        self._generation = manifest['generation']
+        self._snapshot_name = manifest['snapshot']
+        self._wal_names = manifest['wals']
+
+        if self._snapshot_name:
+            index_name = self._snapshot_name.replace('.log', '.idx')
+            with open(self._path(index_name), encoding='utf-8') as file:
+                for login, (offset, length) in json.load(file).items():
+                    self._index[login] = (self._snapshot_name, offset, length)
+            self._open(self._snapshot_name)
+
+        self._wal_records = 0
+        for name in self._wal_names:
+            self._wal_size = self._replay_wal(name)
+            self._open(name)
+        self._wal_name = self._wal_names[-1]
+
+    def _replay_wal(self, name):
+        offset = 0
+        try:
+            with open(self._path(name), 'rb') as file:
+                for line in file:
+                    if not line.endswith(b'\n'):
+                        break
+                    record = json.loads(line)
+                    self._index[record['login']] = (name, offset, len(line))
+                    self._wal_records += 1
+                    offset += len(line)
+        except FileNotFoundError:
+            return 0
+
+        # недописанная при падении строка в конце журнала отбрасывается
+        os.truncate(self._path(name), offset)
+        return offset
+
+    def _write_manifest(self):
+        manifest = {
+            'generation': self._generation,
+            'snapshot': self._snapshot_name,
+            'wals': self._wal_names,
+        }
+        self._write_atomic('CURRENT', json.dumps(manifest))
+
+    def _read_locked(self, login):
+        if login in self._cache:
+            self._cache.move_to_end(login)
+            return self._cache[login]
+
+        if login in self._pending:
+            return self._pending[login]
+
+        location = self._index.get(login)
+        if location is None:
+            return None
+
+        name, offset, length = location
+        record = json.loads(os.pread(self._files[name], length, offset))
+        self._cache_put_locked(login, record)
+        return record
+
+    def _cache_put_locked(self, login, record):
+        self._cache[login] = record
+        self._cache.move_to_end(login)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, login):
+        with self._lock:
+            return self._read_locked(login)
+
+    def _append_locked(self, login, record):
+        if login in self._index:
+            return False
+
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        self._index[login] = (self._wal_name, self._wal_size, len(line))
+        self._wal_size += len(line)
+        self._wal_records += 1
+        self._pending[login] = record
+        self._buffer.append((login, line))
+        return True
+
+    def add(self, login, record):
+        with self._lock:
+            return self._append_locked(login, dict(record, login=login))
+
+    def add_many(self, items):
+        records = [(login, dict(record, login=login)) for login, record in items]
+        with self._lock:
+            return [self._append_locked(login, record) for login, record in records]
+
+    def __contains__(self, login):
+        with self._lock:
+            return login in self._index
+
+    def __len__(self):
+        with self._lock:
+            return len(self._index)
+
+    def _write_batch(self, fd, batch):
+        os.write(fd, b''.join(line for _login, line in batch))
+        os.fsync(fd)
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            fd = self._files[self._wal_name]
+
+        if not batch:
+            return
+
+        # пишет только поток сброса (или close после его остановки),
+        # поэтому запись и fsync выполняются без блокировки
+        self._write_batch(fd, batch)
+
+        with self._lock:
+            for login, _line in batch:
+                self._pending.pop(login, None)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if self._wal_records >= self.snapshot_every:
+                self.snapshot()
+
+    def snapshot(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            if batch:
+                self._write_batch(self._files[self._wal_name], batch)
+                self._pending.clear()
+
+            old_snapshot = self._snapshot_name
+            old_wals = list(self._wal_names)
+            frozen = dict(self._index)
+
+            # новые записи идут в новый журнал, пока строится снимок
+            self._generation += 1
+            self._wal_name = f'wal-{self._generation}.log'
+            self._wal_names.append(self._wal_name)
+            self._wal_size = 0
+            self._wal_records = 0
+            self._open(self._wal_name)
+            self._write_manifest()
+
+        snapshot_name = f'snapshot-{self._generation}.log'
+        index = {}
+        offset = 0
+        with open(self._path(snapshot_name), 'wb') as snapshot:
+            for login, (name, record_offset, length) in frozen.items():
+                snapshot.write(os.pread(self._files[name], length, record_offset))
+                index[login] = [offset, length]
+                offset += length
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+
+        self._write_atomic(snapshot_name.replace('.log', '.idx'), json.dumps(index))
+
+        with self._lock:
+            self._open(snapshot_name)
+            for login, (record_offset, length) in index.items():
+                self._index[login] = (snapshot_name, record_offset, length)
+
+            self._snapshot_name = snapshot_name
+            self._wal_names = [self._wal_name]
+            self._write_manifest()
+
+            obsolete = old_wals + ([old_snapshot] if old_snapshot else [])
+            for name in obsolete:
+                os.close(self._files.pop(name))
+
+        for name in obsolete:
+            os.remove(self._path(name))
+        if old_snapshot:
+            os.remove(self._path(old_snapshot.replace('.log', '.idx')))
+
+    def _write_atomic(self, name, content):
+        tmp_path = self._path(name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self._path(name))
+
+    def close(self):
+        self._stop.set()
+        self._flusher.join()
+        self.flush()
+
+        with self._lock:
+            for fd in self._files.values():
+                os.close(fd)
+            self._files.clear()
+
+class SqliteStore:
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS users (login TEXT PRIMARY KEY, record TEXT NOT NULL)')
+
+    def _connection(self):
+        # у каждого потока свое соединение, sqlite3 не разрешает делить их
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def get(self, login):
+        row = self._connection().execute('SELECT record FROM users WHERE login = ?', (login,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add(self, login, record):
+        return self.add_many([(login, record)])[0]
+
+    def add_many(self, items):
+        connection = self._connection()
+        results = []
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for login, record in items:
+                cursor = connection.execute(
+                    'INSERT OR IGNORE INTO users (login, record) VALUES (?, ?)',
+                    (login, json.dumps(dict(record, login=login))),
+                )
+                results.append(cursor.rowcount == 1)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return results
+
+    def __contains__(self, login):
+        return self._connection().execute('SELECT 1 FROM users WHERE login = ?', (login,)).fetchone() is not None
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+def is_shared_store(path):
+    return path is not None and path.endswith(('.db', '.sqlite'))
+
+def open_store(path=None):
+    if path is None:
+        return MemoryStore()
+    if is_shared_store(path):
+        return SqliteStore(path)
+    return LogStore(path)
@@ -0,0 +1,66 @@
+"""
+
+Бенчмарк пакетной регистрации: регистрирует одно и то же число
+пользователей пачками разного размера (command:reg_batch) по одному
+постоянному соединению и выводит пропускную способность в пользователях
+в секунду. Размер 1 - обычная команда command:reg на каждого пользователя.
+
+    python bench_batch.py --users 20000 --sizes 1 10 100 1000
+
+
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client import build_batch
+from framing import FramedConnection
+from load_test import SCRYPT_N, get_free_port, start_server
+
+def run_batches(port, users, batch_size, prefix):
+    credentials = [(f"{prefix}{i}", "12345678") for i in range(users)]
+    if batch_size == 1:
+        commands = [f"command:reg; login:{login}; password:{password}" for login, password in credentials]
+    else:
+        commands = [build_batch('reg_batch', credentials[start:start + batch_size])
+                    for start in range(0, users, batch_size)]
+
+    started = time.perf_counter()
+    with FramedConnection('127.0.0.1', port) as connection:
+        responses = connection.pipeline(commands)
+    elapsed = time.perf_counter() - started
+
+    registered = sum(response.count("The user is registered!") for response in responses)
+    return registered, elapsed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Пропускная способность command:reg_batch")
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--mode', choices=['async', 'blocking'], default='async')
+    parser.add_argument('--scrypt-n', type=int, default=SCRYPT_N)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    port = get_free_port()
+    process = start_server(args.mode, port, backlog=128, workers=4, scrypt_n=args.scrypt_n)
+
+    print(f"{'пачка':>6} {'команд':>7} {'сек':>7} {'польз/с':>9}")
+    try:
+        for batch_size in args.sizes:
+            registered, elapsed = run_batches(port, args.users, batch_size, f"b{batch_size}user")
+            if registered != args.users:
+                print(f"зарегистрировано {registered} из {args.users}")
+            commands = -(-args.users // batch_size)
+            print(f"{batch_size:>6} {commands:>7} {elapsed:>7.2f} {registered / elapsed:>9.0f}")
+    finally:
+        process.terminate()
+        process.wait()
+
+if __name__ == '__main__':
+    main()
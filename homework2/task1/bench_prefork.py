@@ -0,0 +1,56 @@
+"""
+
+Масштабирование server.py в режиме prefork: запускает сервер с разным
+числом процессов-обработчиков (--processes) на общем хранилище SQLite и
+прогоняет одну и ту же нагрузку из load_test.py. Выводит соединения в
+секунду и ускорение относительно одного процесса. Прирост ограничен числом
+ядер машины (os.cpu_count()).
+
+    python bench_prefork.py --processes 1 2 4 --connections 4000
+
+
+"""
+
+import argparse
+import os
+import tempfile
+
+from load_test import SCRYPT_N, get_free_port, run_load, start_server
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Масштабирование server.py по числу процессов")
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--connections', type=int, default=4000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--backlog', type=int, default=128)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="процессов хеширования на каждый обработчик")
+    parser.add_argument('--mode', choices=['async', 'blocking'], default='async')
+    parser.add_argument('--scrypt-n', type=int, default=SCRYPT_N)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    print(f"ядер: {os.cpu_count()}")
+
+    baseline = None
+    print(f"{'процессов':>9} {'успешно':>8} {'ошибки':>7} {'сек':>7} {'соед/с':>9} {'ускорение':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for processes in args.processes:
+            port = get_free_port()
+            store = os.path.join(directory, f'users-{processes}.db')
+            process = start_server(args.mode, port, args.backlog, args.workers, args.scrypt_n,
+                                   processes=processes, store=store)
+            try:
+                result = run_load(port, args.connections, args.concurrency, f"p{processes}user")
+            finally:
+                process.terminate()
+                process.wait()
+
+            baseline = baseline or result['conn_per_sec']
+            speedup = result['conn_per_sec'] / baseline if baseline else 0.0
+            print(f"{processes:>9} {result['ok']:>8} {result['errors']:>7} "
+                  f"{result['seconds']:>7.2f} {result['conn_per_sec']:>9.0f} {speedup:>9.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -15,9 +15,20 @@
 
 """
 
+import os
 import socket
- 
-def send_command(server_ip, server_port, command):
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from framing import FramedConnection
+
+def send_command(server_ip, server_port, command, connection=None):
+    if connection is not None:
+        response = connection.send(command)
+        print(f"Сервер отправил ответ: {response}")
+        return response
+
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     
     try:
@@ -26,25 +37,52 @@ def send_command(server_ip, server_port, command):
         
         response = client_socket.recv(1024).decode('utf-8')
         print(f"Сервер отправил ответ: {response}")
+        return response
     
     finally:
         client_socket.close()
 
-def register_user(server_ip, server_port, login, password):
+def register_user(server_ip, server_port, login, password, connection=None):
     command = f"command:reg; login:{login}; password:{password}"
-    send_command(server_ip, server_port, command)
+    return send_command(server_ip, server_port, command, connection)
 
-def signin_user(server_ip, server_port, login, password):
+def signin_user(server_ip, server_port, login, password, connection=None):
     command = f"command:signin; login:{login}; password:{password}"
-    send_command(server_ip, server_port, command)
+    return send_command(server_ip, server_port, command, connection)
+
+def build_batch(command_value, credentials):
+    items = '; '.join(f"login:{login}; password:{password}" for login, password in credentials)
+    return f"command:{command_value}; {items}"
+
+def register_users(server_ip, server_port, credentials, connection=None, batch_size=500):
+    credentials = list(credentials)
+    batches = [build_batch('reg_batch', credentials[start:start + batch_size])
+               for start in range(0, len(credentials), batch_size)]
+
+    # пачки не помещаются в одно сообщение старого формата, поэтому
+    # всегда отправляются кадрами
+    if connection is not None:
+        responses = connection.pipeline(batches)
+    else:
+        with FramedConnection(server_ip, server_port) as connection:
+            responses = connection.pipeline(batches)
+
+    for response in responses:
+        print(f"Сервер отправил ответ: {response}")
+
+    return [line for response in responses for line in response.split('\n')]
 
 server_ip = '127.0.0.1' # Почему необходимо использовать '127.0.0.1'
 server_port = 12345
 
-register_user(server_ip, server_port, "marina", "12345")
-register_user(server_ip, server_port, "kirill", "54321")
-register_user(server_ip, server_port, "marina", "12345")
+if __name__ == '__main__':
+    register_users(server_ip, server_port, [("olga", "11111"), ("pavel", "22222")])
+    register_user(server_ip, server_port, "marina", "12345")
+    register_user(server_ip, server_port, "kirill", "54321")
+    register_user(server_ip, server_port, "marina", "12345")
 
-signin_user(server_ip, server_port, "marina", "12345")
-signin_user(server_ip, server_port, "kirill", "54321")
-signin_user(server_ip, server_port, "kirill1", "54321")
+    # все команды входа идут по одному постоянному соединению
+    with FramedConnection(server_ip, server_port) as connection:
+        signin_user(server_ip, server_port, "marina", "12345", connection)
+        signin_user(server_ip, server_port, "kirill", "54321", connection)
+        signin_user(server_ip, server_port, "kirill1", "54321", connection)
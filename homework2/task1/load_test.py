@@ -0,0 +1,101 @@
+"""
+
+Нагрузочный тест сервера регистрации: запускает server.py в режимах blocking
+и async на свободном порту, открывает много коротких соединений
+(одна команда command:reg на соединение) и сравнивает число обработанных
+соединений в секунду.
+
+    python load_test.py --connections 2000 --concurrency 64
+
+
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# по умолчанию scrypt облегчен, чтобы измерялась работа сервера, а не хеширование
+SCRYPT_N = 2 ** 4
+SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py')
+
+def get_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Сервер не поднялся на порту {port}")
+
+def start_server(mode, port, backlog, workers, scrypt_n=SCRYPT_N, processes=1, store=None):
+    command = [sys.executable, SERVER_PATH, '--mode', mode, '--port', str(port),
+               '--host', '127.0.0.1', '--backlog', str(backlog),
+               '--workers', str(workers), '--scrypt-n', str(scrypt_n), '--quiet',
+               '--processes', str(processes)]
+    if store:
+        command += ['--store', store]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    wait_for_port(port)
+    return process
+
+def send_one(port, login):
+    command = f"command:reg; login:{login}; password:12345678"
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=5) as client_socket:
+            client_socket.sendall(command.encode('utf-8'))
+            return bool(client_socket.recv(1024))
+    except OSError:
+        return False
+
+def run_load(port, connections, concurrency, prefix):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: send_one(port, f"{prefix}{i}"), range(connections)))
+    elapsed = time.perf_counter() - started
+
+    ok = sum(results)
+    return {
+        'ok': ok,
+        'errors': connections - ok,
+        'seconds': elapsed,
+        'conn_per_sec': ok / elapsed if elapsed else 0.0,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест server.py")
+    parser.add_argument('--connections', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--backlog', type=int, default=128)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--modes', nargs='+', default=['blocking', 'async'])
+    parser.add_argument('--scrypt-n', type=int, default=SCRYPT_N)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    print(f"{'режим':<10} {'успешно':>8} {'ошибки':>7} {'сек':>7} {'соед/с':>9}")
+    for mode in args.modes:
+        port = get_free_port()
+        process = start_server(mode, port, args.backlog, args.workers, args.scrypt_n)
+        try:
+            result = run_load(port, args.connections, args.concurrency, f"{mode}user")
+        finally:
+            process.terminate()
+            process.wait()
+
+        print(f"{mode:<10} {result['ok']:>8} {result['errors']:>7} "
+              f"{result['seconds']:>7.2f} {result['conn_per_sec']:>9.0f}")
+
+if __name__ == '__main__':
+    main()
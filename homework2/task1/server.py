@@ -15,58 +15,301 @@
 
 """
 
+import argparse
+import asyncio
+import json
+import os
+import signal
 import socket
+import sys
 
-server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-server_socket.bind(('0.0.0.0', 12345)) # Почему необходимо использовать '0.0.0.0' 
-server_socket.listen(1)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-store = {}
+from framing import encode_frame, is_framed, read_frame, read_frame_async
+from hashing import SCRYPT_N, HashPool
+from prefork import create_reuseport_socket, run_prefork
+from storage import MemoryStore, is_shared_store, open_store
 
-print("Сервер запущен и ожидает подключений...")
+HOST = '0.0.0.0' # Почему необходимо использовать '0.0.0.0'
+PORT = 12345
+BACKLOG = 128
+WORKERS = 4
 
-while True:
-    client_socket, client_address = server_socket.accept()
-    print(f"Клиент подключился: {client_address}")
+store = MemoryStore()
+hash_pool = HashPool(WORKERS)
 
-    data = client_socket.recv(1024).decode()
-    print(f"Клиент отправил данные: {data}")
+verbose = True
 
-    if not data:
-        print("Клиент отправил пустые данные.")
-        client_socket.close()
-        continue
+def log(message):
+    if verbose:
+        print(message)
 
-    try:
-        parts = data.split('; ')
-        if len(parts) != 3:
-            raise ValueError("Неверный формат данных")
+REGISTERED = "The user is registered!"
+ALREADY_REGISTERED = "The user is already registered..."
+LOGGED_IN = "The user is logged in!"
+SIGNIN_FAILED = "There's no such user or password is incorrect..."
+
+REG_COMMANDS = ('reg', 'reg_batch')
+SIGNIN_COMMANDS = ('signin', 'signin_batch')
 
-        command, login, password = parts
-        command_type, command_value = command.split(':')
+def parse_credentials(parts):
+    if not parts or len(parts) % 2:
+        raise ValueError("Неверный формат данных")
+
+    credentials = []
+    for login, password in zip(parts[::2], parts[1::2]):
         login_type, login_value = login.split(':')
         password_type, password_value = password.split(':')
+        credentials.append((login_value, password_value))
+    return credentials
+
+# "command:reg_batch; login:<l1>; password:<p1>; login:<l2>; password:<p2>; ..."
+# (и так же command:signin_batch) - ответ содержит по строке на каждого пользователя
+def parse_command(data):
+    parts = data.split('; ')
+    if parts[0] == 'command:stats':
+        return 'stats', []
+    if parts[0] in ('command:reg_batch', 'command:signin_batch'):
+        return parts[0].split(':')[1], parse_credentials(parts[1:])
+
+    if len(parts) != 3:
+        raise ValueError("Неверный формат данных")
+
+    command_type, command_value = parts[0].split(':')
+    return command_value, parse_credentials(parts[1:])
+
+def signin_pairs(credentials):
+    users = [store.get(login_value) for login_value, _password in credentials]
+    # несуществующим пользователям хеш не считается
+    pairs = [(password_value, user['password'])
+             for (_login, password_value), user in zip(credentials, users) if user]
+    return users, pairs
 
-        if command_value == 'reg':
-            if login_value in store:
-                response = "The user is already registered..."
-            else:
-                store[login_value] = {'password': password_value, 'login': login_value}
-                response = "The user is registered!"
+def merge_signin(users, verified):
+    verified = iter(verified)
+    return [bool(user) and next(verified) for user in users]
 
-        elif command_value == 'signin':
-            if login_value in store and store[login_value]['password'] == password_value:
-                response = "The user is logged in!"
-            else:
-                response = "There's no such user or password is incorrect..."
+def register(credentials, hashes):
+    return store.add_many(
+        (login_value, {'password': password_hash, 'login': login_value})
+        for (login_value, _password), password_hash in zip(credentials, hashes)
+    )
 
+def format_response(command_value, credentials, results):
+    if command_value in REG_COMMANDS:
+        lines = [REGISTERED if added else ALREADY_REGISTERED for added in results]
+    else:
+        lines = [LOGGED_IN if logged_in else SIGNIN_FAILED for logged_in in results]
+
+    if not command_value.endswith('_batch'):
+        return lines[0]
+    return '\n'.join(f"{login_value}: {line}" for (login_value, _password), line in zip(credentials, lines))
+
+def handle_command(data):
+    try:
+        command_value, credentials = parse_command(data)
+        passwords = [password_value for _login, password_value in credentials]
+
+        if command_value in REG_COMMANDS:
+            results = register(credentials, hash_pool.hash_sync(passwords))
+        elif command_value in SIGNIN_COMMANDS:
+            users, pairs = signin_pairs(credentials)
+            results = merge_signin(users, hash_pool.verify_sync(pairs))
+        elif command_value == 'stats':
+            return json.dumps(hash_pool.stats())
         else:
-            response = "Unknown command."
+            return "Unknown command."
 
+        response = format_response(command_value, credentials, results)
     except Exception as e:
         response = f"Error: {str(e)}"
 
-    client_socket.send(response.encode('utf-8'))
-    print(f"Ответ сервера: {response}")
+    return response
+
+async def handle_command_async(data):
+    try:
+        command_value, credentials = parse_command(data)
+        passwords = [password_value for _login, password_value in credentials]
+
+        # хеши считаются в пуле процессов, цикл событий при этом не блокируется
+        if command_value in REG_COMMANDS:
+            results = register(credentials, await hash_pool.hash(passwords))
+        elif command_value in SIGNIN_COMMANDS:
+            users, pairs = signin_pairs(credentials)
+            results = merge_signin(users, await hash_pool.verify(pairs))
+        elif command_value == 'stats':
+            return json.dumps(hash_pool.stats())
+        else:
+            return "Unknown command."
+
+        response = format_response(command_value, credentials, results)
+    except Exception as e:
+        response = f"Error: {str(e)}"
+
+    return response
+
+def create_server_socket(host, port, backlog):
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.bind((host, port))
+    server_socket.listen(backlog)
+    return server_socket
+
+def serve_framed_blocking(client_socket):
+    while True:
+        data = read_frame(client_socket)
+        if data is None:
+            return
+
+        log(f"Клиент отправил данные: {data}")
+        response = handle_command(data)
+        client_socket.sendall(encode_frame(response))
+        log(f"Ответ сервера: {response}")
+
+def serve_blocking(server_socket):
+    while True:
+        client_socket, client_address = server_socket.accept()
+        log(f"Клиент подключился: {client_address}")
+
+        try:
+            if is_framed(client_socket.recv(1, socket.MSG_PEEK)):
+                serve_framed_blocking(client_socket)
+                continue
+
+            data = client_socket.recv(1024).decode()
+            log(f"Клиент отправил данные: {data}")
+
+            if not data:
+                log("Клиент отправил пустые данные.")
+                continue
+
+            response = handle_command(data)
+
+            client_socket.send(response.encode('utf-8'))
+            log(f"Ответ сервера: {response}")
+        except (ConnectionError, ValueError) as e:
+            log(f"Клиент {client_address} отключился: {e}")
+        finally:
+            client_socket.close()
+
+async def serve_framed_async(reader, writer, prefix):
+    while True:
+        data = await read_frame_async(reader, prefix)
+        prefix = b''
+        if data is None:
+            return
+
+        log(f"Клиент отправил данные: {data}")
+        response = await handle_command_async(data)
+        writer.write(encode_frame(response))
+        await writer.drain()
+        log(f"Ответ сервера: {response}")
+
+async def handle_client(reader, writer):
+    client_address = writer.get_extra_info('peername')
+    log(f"Клиент подключился: {client_address}")
+
+    try:
+        first_byte = await reader.read(1)
+        if is_framed(first_byte):
+            await serve_framed_async(reader, writer, first_byte)
+            return
+
+        data = (first_byte + await reader.read(1023)).decode() if first_byte else ''
+        log(f"Клиент отправил данные: {data}")
+
+        if not data:
+            log("Клиент отправил пустые данные.")
+            return
+
+        response = await handle_command_async(data)
+
+        writer.write(response.encode('utf-8'))
+        await writer.drain()
+        log(f"Ответ сервера: {response}")
+    except (ConnectionError, ValueError) as e:
+        log(f"Клиент {client_address} отключился: {e}")
+    finally:
+        writer.close()
+
+async def serve_async(server_socket):
+    # SIGTERM (например, от supervisor в режиме prefork) останавливает сервер
+    # между запросами, а не посреди обработки
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+
+    server = await asyncio.start_server(handle_client, sock=server_socket)
+    async with server:
+        await stop.wait()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Сервер регистрации и входа пользователей")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--mode', choices=['async', 'blocking'], default='async',
+                        help="async - asyncio с пулом процессов для хешей, blocking - по одному клиенту")
+    parser.add_argument('--backlog', type=int, default=BACKLOG)
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="число процессов для хеширования паролей")
+    parser.add_argument('--scrypt-n', type=int, default=SCRYPT_N,
+                        help="параметр стоимости scrypt для новых паролей")
+    parser.add_argument('--store', default=None,
+                        help="каталог для хранения пользователей на диске (по умолчанию - в памяти)")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="число процессов-обработчиков на одном порту (prefork, SO_REUSEPORT)")
+    parser.add_argument('--quiet', action='store_true', help="не выводить лог подключений")
+    args = parser.parse_args()
+    if args.processes > 1 and not is_shared_store(args.store):
+        parser.error("для --processes > 1 нужно общее хранилище: --store users.db")
+    return args
+
+def run_server(args, server_socket):
+    global store, hash_pool
+
+    store = open_store(args.store)
+    hash_pool = HashPool(args.workers, n=args.scrypt_n)
+
+    if args.mode == 'blocking':
+        # SIGTERM (process.terminate() в бенчмарках) - как Ctrl+C, чтобы
+        # выполнился finally и закрылся пул хеширования
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    try:
+        if args.mode == 'blocking':
+            serve_blocking(server_socket)
+        else:
+            asyncio.run(serve_async(server_socket))
+    finally:
+        server_socket.close()
+        hash_pool.close()
+        store.close()
+
+def run_worker(args, worker_id):
+    server_socket = create_reuseport_socket(args.host, args.port, args.backlog)
+    log(f"Процесс {worker_id} (pid {os.getpid()}) ожидает подключений...")
+    run_server(args, server_socket)
+
+def main():
+    global verbose
+
+    args = parse_args()
+    verbose = not args.quiet
+
+    if args.processes > 1:
+        # проверяем, что порт свободен, до запуска обработчиков
+        create_reuseport_socket(args.host, args.port, args.backlog).close()
+        print(f"Сервер запущен ({args.mode}, prefork) и ожидает подключений...")
+        run_prefork(lambda worker_id: run_worker(args, worker_id), args.processes)
+        print("Сервер остановлен.")
+        return
+
+    server_socket = create_server_socket(args.host, args.port, args.backlog)
+    print(f"Сервер запущен ({args.mode}) и ожидает подключений...")
+
+    try:
+        run_server(args, server_socket)
+    except KeyboardInterrupt:
+        print("Сервер остановлен.")
 
-    client_socket.close()
+if __name__ == '__main__':
+    main()
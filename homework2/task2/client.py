@@ -1,10 +1,16 @@
+import os
 import socket
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from framing import FramedConnection
 
 def send_http_request(host, port, path):
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     client_socket.connect((host, port))
     
-    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n"
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n"
     client_socket.send(request.encode('utf-8'))
     
     response = client_socket.recv(1024).decode('utf-8')
@@ -13,7 +19,29 @@ def send_http_request(host, port, path):
     
     client_socket.close()
 
-def send_custom_command(host, port, command):
+def send_framed_command(host, port, command, connection=None):
+    # сервер закрывает простаивающее соединение через KEEP_ALIVE_TIMEOUT,
+    # поэтому при обрыве переподключаемся и повторяем команду один раз
+    for _attempt in range(2):
+        if connection is None:
+            connection = FramedConnection(host, port)
+        try:
+            response = connection.send(command)
+        except OSError:
+            response = None
+        if response is not None:
+            return response, connection
+        connection.close()
+        connection = None
+    raise ConnectionError("Сервер закрыл соединение")
+
+def send_custom_command(host, port, command, connection=None):
+    if connection is not None:
+        response, connection = send_framed_command(host, port, command, connection)
+        print("Ответ от сервера:")
+        print(response)
+        return connection
+
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     client_socket.connect((host, port))
     
@@ -24,10 +52,13 @@ def send_custom_command(host, port, command):
     print(response)
     
     client_socket.close()
+    return None
 
 def start_client():
     host = '127.0.0.1'
     port = 8000
+    # команды регистрации и входа идут по одному постоянному соединению
+    connection = None
     
     while True:
         print("\nВыберите тип запроса:")
@@ -44,17 +75,20 @@ def start_client():
             login = input("Введите логин: ")
             password = input("Введите пароль: ")
             command = f"command:reg; login:{login}; password:{password}"
-            send_custom_command(host, port, command)
+            connection = send_custom_command(host, port, command, connection or FramedConnection(host, port))
         elif choice == '3':
             login = input("Введите логин: ")
             password = input("Введите пароль: ")
             command = f"command:signin; login:{login}; password:{password}"
-            send_custom_command(host, port, command)
+            connection = send_custom_command(host, port, command, connection or FramedConnection(host, port))
         elif choice == '4':
             print("Выход из клиента.")
+            if connection:
+                connection.close()
             break
         else:
             print("Неверный выбор. Попробуйте снова.")
 
-start_client()
+if __name__ == '__main__':
+    start_client()
     
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""
+
+Инкрементальный разбор HTTP/1.1 запросов.
+
+HttpParser получает байты по мере их прихода из сокета (feed) и возвращает
+все запросы, которые удалось собрать целиком. Незаконченный запрос остается
+в буфере до следующего feed, поэтому заголовки и тело могут быть любого
+размера (в пределах лимитов) и приходить частями, а несколько запросов
+подряд в одном соединении (keep-alive, pipelining) разбираются по очереди.
+Тело читается по Content-Length или в chunked-кодировке.
+
+
+"""
+
+from urllib.parse import parse_qs
+
+HTTP_METHODS = (b'GET ', b'POST ', b'HEAD ', b'PUT ', b'DELETE ', b'OPTIONS ', b'PATCH ')
+
+MAX_HEADER_SIZE = 64 * 1024
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+class HttpParseError(ValueError):
+    pass
+
+class HttpRequest:
+    def __init__(self, method, path, version, headers, body=b''):
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def query(self):
+        _path, _, query = self.path.partition('?')
+        return {name: values[-1] for name, values in parse_qs(query).items()}
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.1':
+            return connection != 'close'
+        return False
+
+def is_http(data):
+    return data.startswith(HTTP_METHODS)
+
+def is_http_prefix(data):
+    # первые байты пришли, но их пока не хватает, чтобы узнать метод
+    return any(method.startswith(data) and method != data for method in HTTP_METHODS)
+
+def parse_headers(lines):
+    headers = {}
+    for line in lines:
+        name, separator, value = line.partition(':')
+        if not separator:
+            raise HttpParseError(f"Неверный заголовок: {line!r}")
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+class HttpParser:
+    def __init__(self, max_header_size=MAX_HEADER_SIZE, max_body_size=MAX_BODY_SIZE):
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self._buffer = bytearray()
+        self._request = None
+        self._body = None
+        self._remaining = 0
+        self._state = 'headers'
+
+    @property
+    def pending(self):
+        return bool(self._buffer) or self._state != 'headers'
+
+    def feed(self, data):
+        self._buffer += data
+        requests = []
+
+        while True:
+            if self._state == 'headers':
+                if not self._parse_head():
+                    break
+            elif self._state == 'body':
+                if not self._read_body():
+                    break
+            elif self._state == 'chunk_size':
+                if not self._read_chunk_size():
+                    break
+            elif self._state == 'chunk_data':
+                if not self._read_chunk_data():
+                    break
+            elif self._state == 'trailers':
+                if not self._read_trailers():
+                    break
+
+            if self._state == 'done':
+                self._request.body = bytes(self._body)
+                requests.append(self._request)
+                self._request = None
+                self._body = None
+                self._state = 'headers'
+
+        return requests
+
+    def _take_line(self, limit):
+        end = self._buffer.find(b'\r\n')
+        if end == -1:
+            if len(self._buffer) > limit:
+                raise HttpParseError("Слишком длинная строка")
+            return None
+        line = bytes(self._buffer[:end])
+        del self._buffer[:end + 2]
+        return line
+
+    def _parse_head(self):
+        # пустые строки между запросами допускаются (RFC 9112, 2.2)
+        while self._buffer.startswith(b'\r\n'):
+            del self._buffer[:2]
+
+        end = self._buffer.find(b'\r\n\r\n')
+        if end == -1:
+            if len(self._buffer) > self.max_header_size:
+                raise HttpParseError("Слишком большие заголовки")
+            return False
+
+        head = bytes(self._buffer[:end]).decode('iso-8859-1')
+        del self._buffer[:end + 4]
+
+        request_line, *header_lines = head.split('\r\n')
+        parts = request_line.split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise HttpParseError(f"Неверная строка запроса: {request_line!r}")
+
+        method, path, version = parts
+        headers = parse_headers(header_lines)
+        self._request = HttpRequest(method, path, version, headers)
+        self._body = bytearray()
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            self._state = 'chunk_size'
+        elif 'content-length' in headers:
+            try:
+                self._remaining = int(headers['content-length'])
+            except ValueError:
+                raise HttpParseError("Неверный Content-Length")
+            if self._remaining < 0 or self._remaining > self.max_body_size:
+                raise HttpParseError("Недопустимый размер тела")
+            self._state = 'body' if self._remaining else 'done'
+        else:
+            self._state = 'done'
+        return True
+
+    def _read_body(self):
+        chunk = self._buffer[:self._remaining]
+        del self._buffer[:len(chunk)]
+        self._body += chunk
+        self._remaining -= len(chunk)
+        if self._remaining:
+            return False
+        self._state = 'done'
+        return True
+
+    def _read_chunk_size(self):
+        line = self._take_line(1024)
+        if line is None:
+            return False
+        try:
+            size = int(line.split(b';')[0].strip(), 16)
+        except ValueError:
+            raise HttpParseError("Неверный размер chunk")
+        if len(self._body) + size > self.max_body_size:
+            raise HttpParseError("Недопустимый размер тела")
+
+        self._remaining = size
+        self._state = 'chunk_data' if size else 'trailers'
+        return True
+
+    def _read_chunk_data(self):
+        # данные chunk и завершающий их \r\n
+        if len(self._buffer) < self._remaining + 2:
+            return False
+        if self._buffer[self._remaining:self._remaining + 2] != b'\r\n':
+            raise HttpParseError("Chunk не завершен \\r\\n")
+
+        self._body += self._buffer[:self._remaining]
+        del self._buffer[:self._remaining + 2]
+        self._state = 'chunk_size'
+        return True
+
+    def _read_trailers(self):
+        while True:
+            line = self._take_line(self.max_header_size)
+            if line is None:
+                return False
+            if not line:
+                self._state = 'done'
+                return True
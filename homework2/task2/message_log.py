@@ -0,0 +1,213 @@
+"""
+
+Журнал сообщений /message/<login>/<text>/.
+
+Обработчик запроса только кладет сообщение в ограниченную очередь
+(submit) и сразу отвечает. Фоновый поток забирает сообщения пачками и
+дописывает их в сегменты messages-<n>.log (JSON-строки); когда сегмент
+вырастает больше segment_size, начинается следующий, а самые старые
+сегменты сверх max_segments удаляются.
+
+Рядом с каждым сегментом пишется индекс messages-<n>.idx - JSON-строки
+[login, время, смещение, длина] (логин берется из URL и может содержать
+любые символы, поэтому без разделителей). В памяти для каждого логина
+хранятся ссылки на его последние recent_per_login сообщений, поэтому
+recent(login, n) читает с диска только сами эти сообщения, а при запуске
+загружаются индексы, а не весь журнал. Более старые сообщения логина
+recent() не возвращает. Испорченные строки индекса (например, оборванная
+последняя строка) при загрузке пропускаются и считаются в skipped.
+
+Журнал принадлежит одному процессу: в режиме prefork у каждого обработчика
+свой каталог, и recent() видит только сообщения, принятые этим процессом.
+
+Если очередь заполнена, сообщение не ждет места, а отбрасывается и
+учитывается в счетчике dropped (stats()), чтобы медленный диск не
+останавливал обслуживание запросов.
+
+
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+class MessageLog:
+    def __init__(self, directory, queue_size=10000, batch_size=256, segment_size=16 * 1024 * 1024,
+                 max_segments=8, recent_per_login=100, echo=True):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.recent_per_login = recent_per_login
+        self.echo = echo
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._recent = {}
+        self._files = {}
+        self.written = 0
+        self.dropped = 0
+        self.skipped = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._segments = sorted(
+            int(name[len('messages-'):-len('.log')])
+            for name in os.listdir(directory)
+            if name.startswith('messages-') and name.endswith('.log')
+        )
+        for segment in self._segments:
+            self._load_index(segment)
+
+        if not self._segments:
+            self._segments.append(0)
+        # закрытые сегменты только читаются (recent), последний еще и дописывается
+        for segment in self._segments[:-1]:
+            self._files[segment] = os.open(self._path(segment, 'log'), os.O_RDONLY)
+        self._open_segment(self._segments[-1])
+
+        self._writer = threading.Thread(target=self._write_loop, name='message-log', daemon=True)
+        self._writer.start()
+
+    def _path(self, segment, extension):
+        return os.path.join(self.directory, f'messages-{segment}.{extension}')
+
+    def _load_index(self, segment):
+        try:
+            with open(self._path(segment, 'idx'), encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        login, timestamp, offset, length = json.loads(line)
+                        self._remember(login, float(timestamp), segment, int(offset), int(length))
+                    except (ValueError, TypeError):
+                        self.skipped += 1
+        except FileNotFoundError:
+            pass
+
+    def _remember(self, login, timestamp, segment, offset, length):
+        entries = self._recent.get(login)
+        if entries is None:
+            entries = self._recent[login] = deque(maxlen=self.recent_per_login)
+        entries.append((timestamp, segment, offset, length))
+
+    def _open_segment(self, segment):
+        self._segment = segment
+        self._log_fd = os.open(self._path(segment, 'log'), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._index_file = open(self._path(segment, 'idx'), 'a', encoding='utf-8')
+        self._segment_offset = os.lseek(self._log_fd, 0, os.SEEK_END)
+        with self._lock:
+            self._files[segment] = self._log_fd
+
+    def _rotate(self):
+        self._index_file.close()
+        self._open_segment(self._segment + 1)
+        self._segments.append(self._segment)
+
+        while len(self._segments) > self.max_segments:
+            oldest = self._segments.pop(0)
+            with self._lock:
+                os.close(self._files.pop(oldest))
+                for login in list(self._recent):
+                    entries = self._recent[login]
+                    while entries and entries[0][1] == oldest:
+                        entries.popleft()
+                    if not entries:
+                        del self._recent[login]
+            os.remove(self._path(oldest, 'log'))
+            os.remove(self._path(oldest, 'idx'))
+
+    def submit(self, login, text, timestamp=None):
+        try:
+            self._queue.put_nowait((login, text, timestamp or time.time()))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        lines = []
+        index_lines = []
+        entries = []
+        offset = self._segment_offset
+        for login, text, timestamp in batch:
+            line = (json.dumps({'time': timestamp, 'login': login, 'text': text},
+                               ensure_ascii=False) + '\n').encode('utf-8')
+            lines.append(line)
+            index_lines.append(json.dumps([login, timestamp, offset, len(line)], ensure_ascii=False) + '\n')
+            entries.append((login, timestamp, self._segment, offset, len(line)))
+            offset += len(line)
+
+        os.write(self._log_fd, b''.join(lines))
+        self._index_file.write(''.join(index_lines))
+        self._index_file.flush()
+        self._segment_offset = offset
+
+        with self._lock:
+            for entry in entries:
+                self._remember(*entry)
+            self.written += len(batch)
+
+        if self.echo:
+            sys.stdout.write(''.join(
+                f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))} - "
+                f"сообщение от пользователя {login} - {text}\n"
+                for login, text, timestamp in batch
+            ))
+            sys.stdout.flush()
+
+        if self._segment_offset >= self.segment_size:
+            self._rotate()
+
+    def recent(self, login, count=10, since=None):
+        with self._lock:
+            entries = list(self._recent.get(login, ()))[-count:] if count > 0 else []
+            if since is not None:
+                entries = [entry for entry in entries if entry[0] >= since]
+            reads = [(self._files[segment], offset, length) for _time, segment, offset, length in entries]
+            return [json.loads(os.pread(fd, length, offset)) for fd, offset, length in reads]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'written': self.written,
+                'dropped': self.dropped,
+                'skipped': self.skipped,
+                'logins': len(self._recent),
+                'segments': len(self._segments),
+            }
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        self._index_file.close()
+        with self._lock:
+            for fd in self._files.values():
+                os.close(fd)
+            self._files.clear()
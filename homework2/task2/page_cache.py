@@ -0,0 +1,101 @@
+"""
+
+LRU-кеш готовых HTTP-ответов для страниц, которые server.py отдает через
+get_html (index.html, not_found.html).
+
+В кеше хранятся уже закодированные ответы вместе с заголовками ETag и
+Last-Modified, а также готовый ответ 304. Запись считается устаревшей, если
+mtime файла (его сообщает StaticIndex, без обращения к диску) изменился.
+Условные запросы с If-None-Match / If-Modified-Since получают 304 прямо из
+кеша.
+
+
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+class CachedPage:
+    def __init__(self, mtime, etag, response, not_modified):
+        self.mtime = mtime
+        self.etag = etag
+        self.last_modified = int(mtime)
+        self.response = response
+        self.not_modified = not_modified
+
+    def is_not_modified(self, headers):
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or self.etag in tags
+
+        if_modified_since = headers.get('if-modified-since')
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= self.last_modified
+            except (TypeError, ValueError):
+                return False
+
+        return False
+
+class PageCache:
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key, mtime, headers, build):
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None and page.mtime == mtime:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                page = None
+                self.misses += 1
+
+        if page is None:
+            page = self._build(mtime, build)
+            with self._lock:
+                self._entries[key] = page
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        if page.not_modified and page.is_not_modified(headers):
+            with self._lock:
+                self.not_modified += 1
+            return page.not_modified
+        return page.response
+
+    def _build(self, mtime, build):
+        status, content_type, content = build()
+        etag = f'"{hashlib.blake2b(content, digest_size=8).hexdigest()}"'
+        validators = (
+            f"ETag: {etag}\r\n"
+            f"Last-Modified: {formatdate(mtime, usegmt=True)}\r\n"
+        )
+        response = (
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(content)}\r\n"
+            f"{validators}\r\n"
+        ).encode('utf-8') + content
+        not_modified = None
+        if status.startswith('200'):
+            not_modified = f"HTTP/1.1 304 Not Modified\r\n{validators}\r\n".encode('utf-8')
+        return CachedPage(mtime, etag, response, not_modified)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+            }
@@ -0,0 +1,211 @@
+"""
+
+Таблица маршрутов и индекс статических файлов для HTTP-части server.py.
+
+Router хранит шаблоны путей в префиксном дереве по сегментам пути:
+    /test/<int:number>/        - число, передается в обработчик как int
+    /message/<login>/<text>/   - любой непустой сегмент, как строка
+Разбор шаблонов выполняется один раз при регистрации. Путь, записанный
+ровно как шаблон без параметров, находится одним поиском в словаре, а путь
+с параметрами - одним из заранее скомпилированных регулярных выражений.
+Только пути в другой записи (двойные слеши, без завершающего слеша) ищутся
+проходом по дереву длиной в число сегментов пути.
+
+StaticIndex заранее обходит каталог со статикой и хранит url -> (путь,
+размер, mtime), поэтому запрос к несуществующему файлу не делает ни одного
+системного вызова. Индекс перестраивает фоновый поток (start) раз в
+refresh_interval секунд, так что новые и измененные файлы подхватываются
+без перезапуска, а обход каталога не попадает в обработку запроса.
+
+
+"""
+
+import os
+import re
+import threading
+from urllib.parse import unquote
+
+def to_int(segment):
+    if segment.isascii() and segment.isdigit():
+        return int(segment)
+    raise ValueError(segment)
+
+def to_str(segment):
+    return segment
+
+CONVERTERS = {
+    'int': to_int,
+    'str': to_str,
+}
+
+# те же правила в виде регулярных выражений для скомпилированных шаблонов
+PATTERNS = {
+    to_int: '[0-9]+',
+    to_str: '[^/]+',
+}
+
+def split_path(path):
+    return [segment for segment in path.split('/') if segment]
+
+class RouteNode:
+    def __init__(self):
+        self.children = {}
+        self.params = []
+        self.handler = None
+
+def parse_param(segment):
+    converter_name, _, name = segment[1:-1].rpartition(':')
+    return CONVERTERS[converter_name or 'str'], name
+
+def is_param(segment):
+    return segment.startswith('<') and segment.endswith('>')
+
+class Router:
+    def __init__(self):
+        self.root = RouteNode()
+        self.exact = {}
+        self.literals = {}
+        self.compiled = []
+
+    def add(self, pattern, handler):
+        if '<' not in pattern:
+            # маршруты без параметров находятся одним поиском в словаре
+            self.exact.setdefault(pattern, handler)
+            self.literals['/'.join(split_path(pattern))] = handler
+        else:
+            self.compiled.append(self._compile(pattern) + (handler,))
+
+        node = self.root
+        for segment in split_path(pattern):
+            if is_param(segment):
+                converter, name = parse_param(segment)
+                for param_converter, param_name, child in node.params:
+                    if param_converter is converter and param_name == name:
+                        node = child
+                        break
+                else:
+                    child = RouteNode()
+                    node.params.append((converter, name, child))
+                    node = child
+            else:
+                node = node.children.setdefault(segment, RouteNode())
+        node.handler = handler
+
+    def route(self, pattern):
+        def decorator(handler):
+            self.add(pattern, handler)
+            return handler
+        return decorator
+
+    def _compile(self, pattern):
+        parts = []
+        typed = []
+        for segment in split_path(pattern):
+            if is_param(segment):
+                converter, name = parse_param(segment)
+                parts.append(f'(?P<{name}>{PATTERNS[converter]})')
+                if converter is not to_str:
+                    typed.append((name, converter))
+            else:
+                parts.append(re.escape(segment))
+        regex = '/' + '/'.join(parts) + ('/' if pattern.endswith('/') else '')
+        return re.compile(regex + r'\Z').match, tuple(typed)
+
+    def resolve(self, path):
+        handler = self.exact.get(path)
+        if handler:
+            return handler, {}
+
+        for match_path, typed, handler in self.compiled:
+            match = match_path(path)
+            if match is None:
+                continue
+            params = match.groupdict()
+            if '%' in path:
+                params = {name: unquote(value) for name, value in params.items()}
+            try:
+                for name, converter in typed:
+                    params[name] = converter(params[name])
+            except ValueError:
+                continue
+            return handler, params
+
+        segments = split_path(path)
+        handler = self.literals.get('/'.join(segments))
+        if handler:
+            return handler, {}
+
+        params = {}
+        node = self._match(self.root, segments, 0, params)
+        return (node.handler, params) if node else None
+
+    def _match(self, node, segments, position, params):
+        if position == len(segments):
+            return node if node.handler else None
+
+        segment = segments[position]
+        child = node.children.get(segment)
+        if child:
+            match = self._match(child, segments, position + 1, params)
+            if match:
+                return match
+
+        for converter, name, child in node.params:
+            try:
+                params[name] = converter(unquote(segment) if '%' in segment else segment)
+            except ValueError:
+                continue
+            match = self._match(child, segments, position + 1, params)
+            if match:
+                return match
+            del params[name]
+
+        return None
+
+class StaticIndex:
+    def __init__(self, root, refresh_interval=2.0):
+        self.root = root
+        self.refresh_interval = refresh_interval
+        self._files = {}
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def refresh(self):
+        files = {}
+        root = os.path.realpath(self.root)
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames[:] = [name for name in dirnames if not name.startswith('.') and name != '__pycache__']
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue
+                full_path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(full_path)
+                except FileNotFoundError:
+                    # файл удалили во время обхода
+                    continue
+                url = '/' + os.path.relpath(full_path, root).replace(os.sep, '/')
+                files[url] = (full_path, stat.st_size, stat.st_mtime)
+
+        self._files = files
+
+    def start(self):
+        # первый обход - сразу, следующие - в фоновом потоке, запросы
+        # читают готовый словарь и каталог не обходят
+        self.refresh()
+        if self._thread is None and self.refresh_interval:
+            self._thread = threading.Thread(target=self._refresh_loop, name='static-index', daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        while not self._stopped.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except OSError as e:
+                print(f"Не удалось обновить индекс статики: {e}")
+
+    def stop(self):
+        self._stopped.set()
+
+    def get(self, url):
+        return self._files.get(unquote(url) if '%' in url else url)
@@ -45,76 +45,333 @@
 
 '''
 
+import argparse
+import asyncio
+import json
+import mimetypes
 import socket
 import re
 import os
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-users = {}
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from framing import FrameDecoder, encode_frame, is_framed, read_frame
+from http_parser import HttpParseError, HttpParser, is_http, is_http_prefix
+from message_log import MessageLog
+from page_cache import PageCache
+from routes import Router, StaticIndex
+from hashing import SCRYPT_N, HashPool
+from prefork import create_reuseport_socket, run_prefork
+from storage import MemoryStore, is_shared_store, open_store
+
+# отдаются только файлы из этого каталога: не исходники сервера и не --store
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+users = MemoryStore()
+hash_pool = HashPool()
+router = Router()
+static_index = StaticIndex(STATIC_DIR)
+page_cache = PageCache()
+message_log = None
+messages_per_process = False
+
+LOGIN_RE = re.compile(r'^[a-zA-Z0-9]{6,}$')
+DIGIT_RE = re.compile(r'\d')
+REG_RE = re.compile(r"command:reg; login:(.*?); password:(.*?)$")
+SIGNIN_RE = re.compile(r"command:signin; login:(.*?); password:(.*?)$")
+BATCH_RE = re.compile(r"command:(reg|signin)_batch; (.*)$", re.S)
+CREDENTIALS_RE = re.compile(r"login:(.*?); password:(.*?)(?:; (?=login:)|$)", re.S)
+HOST = '0.0.0.0'
+PORT = 8000
+BACKLOG = 128
+HANDLER_THREADS = 16
+
+KEEP_ALIVE_TIMEOUT = 15
+REQUEST_TIMEOUT = 10
+SHUTDOWN_TIMEOUT = 30
+
+MESSAGES_DIR = '.messages'
+
+RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)$')
 
 def validate_login_password(login, password):
-    if not re.match(r'^[a-zA-Z0-9]{6,}$', login):
+    if not LOGIN_RE.match(login):
         return False
-    if len(password) < 8 or not re.search(r'\d', password):
+    if len(password) < 8 or not DIGIT_RE.search(password):
         return False
     return True
 
-def get_html(name: str) -> str:
+def http_response(body, status='200 OK', content_type='text/html; charset=utf-8'):
+    content = body.encode('utf-8') if isinstance(body, str) else body
+    return (
+        f"HTTP/1.1 {status}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(content)}\r\n\r\n"
+    ).encode('utf-8') + content
+
+def read_html(name, status):
+    with open(name, 'r', encoding='utf-8') as file:
+        content = file.read()
+
+    return status, 'text/html; charset=utf-8', content.encode('utf-8')
+
+def get_html(name: str, status='200 OK', request=None) -> bytes:
+    static_file = static_index.get('/' + name)
+    if static_file is None:
+        return http_response(f"Файл {name} не найден.", '404 Not Found')
+
+    full_path, _size, mtime = static_file
+    headers = request.headers if request else {}
     try:
-        with open(name, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        return f"HTTP/1.1 200 OK\n\n{content}"
+        return page_cache.get((name, status), mtime, headers, lambda: read_html(full_path, status))
     except FileNotFoundError:
-        raise f"HTTP/1.1 404 Not Found\n\nФайл {name} не найден."
+        # файл удалили после последнего обхода каталога
+        return http_response(f"Файл {name} не найден.", '404 Not Found')
+
+class FileResponse:
+    def __init__(self, file, status, headers, offset=0, count=0):
+        self.file = file
+        self.status = status
+        self.headers = headers
+        self.offset = offset
+        self.count = count
+
+    def head(self):
+        lines = [f"HTTP/1.1 {self.status}"]
+        lines.extend(f"{name}: {value}" for name, value in self.headers.items())
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+def parse_range(range_header, size):
+    match = RANGE_RE.match(range_header.strip())
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+
+    if start > end or start >= size:
+        raise ValueError(range_header)
+    return start, end
+
+def file_response(full_path, range_header=None):
+    # файл открывается до отправки заголовков: если его удалили после обхода
+    # каталога, будет FileNotFoundError и 404, а не оборванный ответ
+    file = open(full_path, 'rb')
+    size = os.fstat(file.fileno()).st_size
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    if content_type.startswith('text/'):
+        content_type += '; charset=utf-8'
+    headers = {
+        'Content-Type': content_type,
+        'Accept-Ranges': 'bytes',
+    }
+
+    try:
+        byte_range = parse_range(range_header, size) if range_header else None
+    except ValueError:
+        headers['Content-Range'] = f"bytes */{size}"
+        headers['Content-Length'] = '0'
+        file.close()
+        return FileResponse(None, '416 Range Not Satisfiable', headers)
+
+    if byte_range is None:
+        headers['Content-Length'] = str(size)
+        return FileResponse(file, '200 OK', headers, 0, size)
+
+    start, end = byte_range
+    headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+    headers['Content-Length'] = str(end - start + 1)
+    return FileResponse(file, '206 Partial Content', headers, start, end - start + 1)
+
+def without_body(response):
+    # ответ на HEAD - те же заголовки с настоящим Content-Length, но без тела,
+    # иначе тело приняли бы за начало следующего ответа keep-alive соединения
+    if isinstance(response, FileResponse):
+        response.close()
+        response.file = None
+        response.count = 0
+        return response
+    if isinstance(response, str):
+        response = response.encode('utf-8')
+    head, separator, _body = response.partition(b'\r\n\r\n')
+    return head + separator
+
+def send_response(client_socket, response):
+    if isinstance(response, FileResponse):
+        try:
+            client_socket.sendall(response.head())
+            if response.count:
+                # файл уходит из page cache прямо в сокет (sendfile), не проходя через память процесса
+                client_socket.sendfile(response.file, response.offset, response.count)
+        finally:
+            response.close()
+    elif isinstance(response, bytes):
+        client_socket.sendall(response)
+    else:
+        client_socket.sendall(response.encode('utf-8'))
+
+@router.route('/')
+def index_page(request):
+    return get_html('index.html', request=request)
+
+@router.route('/test/<int:number>/')
+def test_page(request, number):
+    return http_response(f"<h1>Тест с номером {number} запущен</h1>")
+
+@router.route('/message/<login>/<text>/')
+def message_page(request, login, text):
+    message = f"{datetime.now()} - сообщение от пользователя {login} - {text}"
+    if message_log is None:
+        print(message)
+    elif not message_log.submit(login, text):
+        return http_response("Очередь сообщений переполнена, попробуйте позже", '503 Service Unavailable')
+    return http_response(message)
+
+@router.route('/messages/<login>/')
+def messages_page(request, login):
+    if message_log is None:
+        return http_response("Журнал сообщений отключен", '404 Not Found')
+
+    try:
+        count = int(request.query.get('n', 10))
+        since = float(request.query['since']) if 'since' in request.query else None
+    except ValueError:
+        return http_response("Параметры n и since должны быть числами", '400 Bad Request')
+
+    # хранятся только последние recent_per_login сообщений логина, а в режиме
+    # prefork - только принятые этим процессом; об этом говорит сам ответ
+    limit = message_log.recent_per_login
+    body = {
+        'login': login,
+        'messages': message_log.recent(login, min(count, limit), since),
+        'limit': limit,
+        'truncated': count > limit,
+        'scope': 'process' if messages_per_process else 'server',
+    }
+    return http_response(json.dumps(body, ensure_ascii=False), content_type='application/json; charset=utf-8')
+
+@router.route('/stats/')
+def stats_page(request):
+    stats = {
+        'page_cache': page_cache.stats(),
+        'hash_pool': hash_pool.stats(),
+        'message_log': message_log.stats() if message_log else None,
+    }
+    return http_response(json.dumps(stats), content_type='application/json')
 
 def handle_http_request(request):
-    headers = request.split('\n')
-    _method, path, _ = headers[0].split()
+    path = request.path.split('?')[0]
     
-    if path == '/':
-        response = get_html('index.html')
-    elif path.startswith('/test/'):
-        test_number = path.split('/')[2]
-        response = f"HTTP/1.1 200 OK\nContent-Type: text/html; charset=utf-8\n\n<h1>Тест с номером {test_number} запущен</h1>"
-    elif path.startswith('/message/'):
-        parts = path.split('/')
-        login = parts[2]
-        text = parts[3]
-
-        message = f"{datetime.now()} - сообщение от пользователя {login} - {text}"
-        print(message)
-        response = f"HTTP/1.1 200 OK\nContent-Type: text/html; charset=utf-8\n\n{message}"
-    elif os.path.isfile('.' + path):
-        with open('.' + path, 'rb') as file:
-            content = file.read()
-
-        response = (
-            f"HTTP/1.1 200 OK\r\n"
-            f"Content-Length: {len(content)}\r\n\r\n"
-         ).encode('utf-8') + content
+    match = router.resolve(path)
+    if match:
+        handler, params = match
+        response = handler(request, **params)
+    elif static_file := static_index.get(path):
+        full_path, _size, _mtime = static_file
+        try:
+            response = file_response(full_path, request.headers.get('range'))
+        except FileNotFoundError:
+            response = get_html('not_found.html', '404 Not Found', request)
     else:
-        response = get_html('not_found.html')
-    
+        response = get_html('not_found.html', '404 Not Found', request)
+
+    if request.method == 'HEAD':
+        response = without_body(response)
     return response
 
+def parse_credentials(body):
+    credentials = []
+    position = 0
+    for match in CREDENTIALS_RE.finditer(body):
+        if match.start() != position:
+            return None
+        credentials.append(match.groups())
+        position = match.end()
+
+    if not credentials or position != len(body):
+        return None
+    return credentials
+
+# хеши паролей считаются в пуле процессов hash_pool
+def register_users(credentials):
+    valid = [validate_login_password(login, password) for login, password in credentials]
+    hashes = iter(hash_pool.hash_sync(
+        [password for (_login, password), is_valid in zip(credentials, valid) if is_valid]
+    ))
+    added = iter(users.add_many(
+        (login, {'password': next(hashes)})
+        for (login, _password), is_valid in zip(credentials, valid) if is_valid
+    ))
+    return [is_valid and next(added) for is_valid in valid]
+
+def signin_users(credentials):
+    found = [users.get(login) for login, _password in credentials]
+    verified = iter(hash_pool.verify_sync(
+        [(password, user['password']) for (_login, password), user in zip(credentials, found) if user]
+    ))
+    return [bool(user) and next(verified) for user in found]
+
+# "command:reg_batch; login:<l1>; password:<p1>; login:<l2>; password:<p2>; ..."
+# (и так же command:signin_batch) - ответ содержит по строке на каждого пользователя
+def handle_batch_request(command, body):
+    now = datetime.now()
+    credentials = parse_credentials(body)
+    if credentials is None:
+        return f"{now} - ошибка пакетной команды - неверный формат данных"
+
+    if command == 'reg':
+        results = register_users(credentials)
+        lines = [
+            f"{now} - пользователь {login} зарегистрирован" if registered else
+            f"{now} - ошибка регистрации {login} - неверный пароль/логин"
+            for (login, _password), registered in zip(credentials, results)
+        ]
+    else:
+        results = signin_users(credentials)
+        lines = [
+            f"{now} - пользователь {login} произведен вход" if logged_in else
+            f"{now} - ошибка входа {login} - неверный пароль/логин"
+            for (login, _password), logged_in in zip(credentials, results)
+        ]
+
+    return '\n'.join(lines)
+
 def handle_non_http_request(data):
-    if data.startswith("command:reg;"):
-        match = re.match(r"command:reg; login:(.*?); password:(.*?)$", data)
+    batch_match = BATCH_RE.match(data)
+    if data == "command:stats":
+        response = json.dumps(hash_pool.stats())
+    elif batch_match:
+        response = handle_batch_request(*batch_match.groups())
+    elif data.startswith("command:reg;"):
+        match = REG_RE.match(data)
         if match:
             login, password = match.groups()
-            if validate_login_password(login, password):
-                users[login] = password
+            if register_users([(login, password)])[0]:
                 response = f"{datetime.now()} - пользователь {login} зарегистрирован"
             else:
                 response = f"{datetime.now()} - ошибка регистрации {login} - неверный пароль/логин"
         else:
             response = f"{datetime.now()} - ошибка регистрации - неверный формат данных"
     elif data.startswith("command:signin;"):
-        match = re.match(r"command:signin; login:(.*?); password:(.*?)$", data)
+        match = SIGNIN_RE.match(data)
         if match:
             login, password = match.groups()
-            if login in users and users[login] == password:
+            if signin_users([(login, password)])[0]:
                 response = f"{datetime.now()} - пользователь {login} произведен вход"
             else:
                 response = f"{datetime.now()} - ошибка входа {login} - неверный пароль/логин"
@@ -125,23 +382,281 @@ def handle_non_http_request(data):
     
     return response
 
-def start_server():
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.bind(('0.0.0.0', 8000))
-    server_socket.listen()
-    print("Сервер запущен на порту 8000...")
+def serve_framed_commands(client_socket):
+    while True:
+        data = read_frame(client_socket)
+        if data is None:
+            return
+
+        client_socket.sendall(encode_frame(handle_non_http_request(data)))
+
+def serve_http(client_socket, data):
+    parser = HttpParser()
+
+    while data:
+        try:
+            requests = parser.feed(data)
+        except HttpParseError as e:
+            send_response(client_socket, http_response(f"Неверный HTTP-запрос: {e}", '400 Bad Request'))
+            return
+
+        # ответы на конвейерные запросы отправляются в порядке запросов
+        for request in requests:
+            send_response(client_socket, handle_http_request(request))
+            if not request.keep_alive:
+                return
+
+        data = client_socket.recv(65536)
+
+def handle_connection(client_socket, addr):
+    try:
+        client_socket.settimeout(KEEP_ALIVE_TIMEOUT)
+        if is_framed(client_socket.recv(1, socket.MSG_PEEK)):
+            serve_framed_commands(client_socket)
+            return
+
+        data = client_socket.recv(65536)
+        while data and is_http_prefix(data):
+            chunk = client_socket.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+        
+        if is_http(data):
+            serve_http(client_socket, data)
+        else:
+            response = handle_non_http_request(data.decode('utf-8'))
+            send_response(client_socket, response)
+    except socket.timeout:
+        pass
+    except (ConnectionError, ValueError) as e:
+        print(f"Клиент {addr} отключился: {e}")
+    finally:
+        client_socket.close()
+
+def start_server(host=HOST, port=PORT, backlog=BACKLOG, server_socket=None):
+    if server_socket is None:
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind((host, port))
+        server_socket.listen(backlog)
+    static_index.start()
+    print(f"Сервер запущен на порту {port}...")
 
     while True:
         client_socket, addr = server_socket.accept()
         print(f"Подключение от {addr}")
-        data = client_socket.recv(1024).decode('utf-8')
-        
-        if data.startswith('GET') or data.startswith('POST'):
-            response = handle_http_request(data)
+
+        # keep-alive соединение может долго ждать следующего запроса,
+        # поэтому каждое соединение обслуживается в своем потоке
+        threading.Thread(target=handle_connection, args=(client_socket, addr), daemon=True).start()
+
+class AsyncConnections:
+    def __init__(self):
+        self.tasks = set()
+        self.idle = set()
+        self.shutting_down = False
+
+async_connections = AsyncConnections()
+
+async def send_response_async(writer, response):
+    if isinstance(response, FileResponse):
+        try:
+            writer.write(response.head())
+            if response.count:
+                await writer.drain()
+                await asyncio.get_running_loop().sendfile(
+                    writer.transport, response.file, response.offset, response.count)
+        finally:
+            response.close()
+    elif isinstance(response, bytes):
+        writer.write(response)
+    else:
+        writer.write(response.encode('utf-8'))
+    await writer.drain()
+
+async def read_idle(reader, writer, timeout):
+    # пока соединение ждет следующего запроса, его можно закрыть при остановке
+    async_connections.idle.add(writer)
+    try:
+        return await asyncio.wait_for(reader.read(65536), timeout)
+    finally:
+        async_connections.idle.discard(writer)
+
+async def serve_http_async(reader, writer, data):
+    loop = asyncio.get_running_loop()
+    parser = HttpParser()
+    request_started = loop.time()
+
+    while data:
+        try:
+            requests = parser.feed(data)
+        except HttpParseError as e:
+            await send_response_async(writer, http_response(f"Неверный HTTP-запрос: {e}", '400 Bad Request'))
+            return
+
+        for request in requests:
+            response = await loop.run_in_executor(None, handle_http_request, request)
+            await send_response_async(writer, response)
+            if not request.keep_alive or async_connections.shutting_down:
+                return
+
+        if not parser.pending:
+            request_started = None
+            data = await read_idle(reader, writer, KEEP_ALIVE_TIMEOUT)
+            continue
+
+        # весь запрос должен прийти за REQUEST_TIMEOUT, даже если клиент
+        # присылает его по байту (slowloris)
+        if requests or request_started is None:
+            request_started = loop.time()
+        timeout = request_started + REQUEST_TIMEOUT - loop.time()
+        if timeout <= 0:
+            raise asyncio.TimeoutError
+        data = await asyncio.wait_for(reader.read(65536), timeout)
+
+async def serve_framed_async(reader, writer, data):
+    loop = asyncio.get_running_loop()
+    decoder = FrameDecoder()
+
+    while data and not async_connections.shutting_down:
+        for message in decoder.feed(data):
+            response = await loop.run_in_executor(None, handle_non_http_request, message)
+            writer.write(encode_frame(response))
+        await writer.drain()
+
+        data = await read_idle(reader, writer, KEEP_ALIVE_TIMEOUT)
+
+async def read_first_chunk(reader):
+    data = await reader.read(65536)
+    while data and is_http_prefix(data):
+        chunk = await reader.read(65536)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+async def handle_async_connection(reader, writer):
+    addr = writer.get_extra_info('peername')
+    print(f"Подключение от {addr}")
+
+    task = asyncio.current_task()
+    async_connections.tasks.add(task)
+    try:
+        data = await asyncio.wait_for(read_first_chunk(reader), REQUEST_TIMEOUT)
+        if is_framed(data):
+            await serve_framed_async(reader, writer, data)
+            return
+
+        if is_http(data):
+            await serve_http_async(reader, writer, data)
+        elif data:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, handle_non_http_request, data.decode('utf-8'))
+            await send_response_async(writer, response)
+    except asyncio.TimeoutError:
+        pass
+    except (ConnectionError, ValueError) as e:
+        print(f"Клиент {addr} отключился: {e}")
+    finally:
+        async_connections.tasks.discard(task)
+        writer.close()
+
+async def serve_async(host=HOST, port=PORT, backlog=BACKLOG, handler_threads=HANDLER_THREADS,
+                      server_socket=None):
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=handler_threads))
+
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    static_index.start()
+    if server_socket is None:
+        server = await asyncio.start_server(handle_async_connection, host, port,
+                                            backlog=backlog, reuse_address=True)
+    else:
+        server = await asyncio.start_server(handle_async_connection, sock=server_socket)
+    print(f"Сервер (asyncio) запущен на порту {port}...")
+
+    async with server:
+        await stop.wait()
+
+        print("Остановка: новые подключения не принимаются, завершаются текущие запросы...")
+        server.close()
+        async_connections.shutting_down = True
+        for writer in list(async_connections.idle):
+            writer.close()
+
+        if async_connections.tasks:
+            await asyncio.wait(list(async_connections.tasks), timeout=SHUTDOWN_TIMEOUT)
+
+    print("Сервер остановлен.")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HTTP и командный сервер")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--backlog', type=int, default=BACKLOG)
+    parser.add_argument('--mode', choices=['async', 'threaded'], default='async',
+                        help="async - asyncio, threaded - поток на каждое соединение")
+    parser.add_argument('--store', default=None,
+                        help="каталог для хранения пользователей на диске (по умолчанию - в памяти)")
+    parser.add_argument('--messages-dir', default=MESSAGES_DIR,
+                        help="каталог журнала сообщений /message/")
+    parser.add_argument('--static-dir', default=STATIC_DIR,
+                        help="каталог со статикой (главная страница, 404 и файлы)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="число процессов для хеширования паролей")
+    parser.add_argument('--scrypt-n', type=int, default=SCRYPT_N,
+                        help="параметр стоимости scrypt для новых паролей")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="число процессов-обработчиков на одном порту (prefork, SO_REUSEPORT)")
+    args = parser.parse_args()
+    if args.processes > 1 and not is_shared_store(args.store):
+        parser.error("для --processes > 1 нужно общее хранилище: --store users.db")
+    return args
+
+def run_server(args, messages_dir, server_socket=None):
+    global users, hash_pool, message_log
+
+    users = open_store(args.store)
+    hash_pool = HashPool(args.workers, n=args.scrypt_n)
+    message_log = MessageLog(messages_dir)
+    static_index.root = args.static_dir
+
+    if args.mode == 'threaded':
+        # SIGTERM (process.terminate() в бенчмарках) - как Ctrl+C, чтобы
+        # выполнился finally и закрылся пул хеширования
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    try:
+        if args.mode == 'threaded':
+            start_server(args.host, args.port, args.backlog, server_socket)
         else:
-            response = handle_non_http_request(data)
-        
-        client_socket.send(response.encode('utf-8'))
-        client_socket.close()
+            asyncio.run(serve_async(args.host, args.port, args.backlog, server_socket=server_socket))
+    finally:
+        message_log.close()
+        hash_pool.close()
+        users.close()
+
+def run_worker(args, worker_id):
+    global messages_per_process
+
+    # у каждого процесса свой журнал сообщений, пользователи - общие
+    messages_per_process = True
+    server_socket = create_reuseport_socket(args.host, args.port, args.backlog)
+    run_server(args, os.path.join(args.messages_dir, f'worker-{worker_id}'), server_socket)
 
-start_server()
+if __name__ == '__main__':
+    args = parse_args()
+
+    try:
+        if args.processes > 1:
+            create_reuseport_socket(args.host, args.port, args.backlog).close()
+            run_prefork(lambda worker_id: run_worker(args, worker_id), args.processes)
+            print("Сервер остановлен.")
+        else:
+            run_server(args, args.messages_dir)
+    except KeyboardInterrupt:
+        print("Сервер остановлен.")
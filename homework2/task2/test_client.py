@@ -0,0 +1,50 @@
+"""
+
+Тесты постоянного соединения клиента client.py: сервер, который закрывает
+соединение после каждого ответа (как server.py после KEEP_ALIVE_TIMEOUT).
+
+    python -m pytest homework2/task2
+
+
+"""
+
+import socket
+import threading
+
+import pytest
+
+from client import send_framed_command
+from framing import encode_frame, read_frame
+
+@pytest.fixture
+def closing_server():
+    listener = socket.create_server(('127.0.0.1', 0))
+    connections = []
+
+    def serve():
+        while True:
+            try:
+                sock, _addr = listener.accept()
+            except OSError:
+                return
+            connections.append(sock)
+            with sock:
+                command = read_frame(sock)
+                sock.sendall(encode_frame(f'ok: {command}'))
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield listener.getsockname()[1], connections
+    listener.close()
+
+def test_reconnects_after_server_closed_connection(closing_server):
+    port, connections = closing_server
+    response, connection = send_framed_command('127.0.0.1', port, 'first')
+    assert response == 'ok: first'
+
+    # соединение уже закрыто сервером - команда уходит по новому
+    response, connection = send_framed_command('127.0.0.1', port, 'second', connection)
+    assert response == 'ok: second'
+    response, connection = send_framed_command('127.0.0.1', port, 'third', connection)
+    assert response == 'ok: third'
+    connection.close()
+    assert len(connections) == 3
@@ -0,0 +1,71 @@
+"""
+
+Тесты журнала сообщений message_log.py.
+
+    python -m pytest homework2/task2
+
+
+"""
+
+import time
+
+from message_log import MessageLog
+
+def open_log(directory):
+    # маленькие сегменты: новый сегмент примерно каждые два сообщения
+    return MessageLog(str(directory), segment_size=150, max_segments=3, echo=False)
+
+def wait_written(log, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while log.stats()['written'] < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def texts(messages):
+    return [message['text'] for message in messages]
+
+def test_recent_returns_last_messages(tmp_path):
+    log = open_log(tmp_path)
+    try:
+        for i in range(3):
+            log.submit('bob', f'hello {i}')
+        log.submit('alice', 'hi')
+        wait_written(log, 4)
+        assert texts(log.recent('bob', 2)) == ['hello 1', 'hello 2']
+        assert texts(log.recent('alice', 10)) == ['hi']
+        assert log.recent('nobody', 10) == []
+    finally:
+        log.close()
+
+def test_restart_with_several_segments(tmp_path):
+    log = open_log(tmp_path)
+    for i in range(5):
+        log.submit('bob', f'first {i}')
+    log.close()
+
+    log = open_log(tmp_path)
+    try:
+        assert log.stats()['segments'] >= 2
+        assert texts(log.recent('bob', 10)) == [f'first {i}' for i in range(5)]
+
+        # новые сообщения заставляют удалить старые сегменты,
+        # в том числе загруженные при запуске
+        for i in range(10):
+            log.submit('bob', f'second {i}')
+        wait_written(log, 10)
+        assert log.stats()['segments'] <= 3
+        assert texts(log.recent('bob', 2)) == ['second 8', 'second 9']
+    finally:
+        log.close()
+
+def test_login_with_control_characters_survives_restart(tmp_path):
+    log = open_log(tmp_path)
+    log.submit('bad\tlogin\n', 'text')
+    log.close()
+
+    log = open_log(tmp_path)
+    try:
+        assert texts(log.recent('bad\tlogin\n', 10)) == ['text']
+        assert log.stats()['skipped'] == 0
+    finally:
+        log.close()
@@ -0,0 +1,39 @@
+"""
+
+Тесты HTTP-части server.py без сокетов: запрос разбирается HttpParser и
+передается в handle_http_request.
+
+    python -m pytest homework2/task2
+
+
+"""
+
+import pytest
+
+import server
+from http_parser import HttpParser
+
+@pytest.fixture(autouse=True)
+def static_index():
+    server.static_index.refresh()
+
+def request(method, path):
+    return HttpParser().feed(f'{method} {path} HTTP/1.1\r\nHost: test\r\n\r\n'.encode())[0]
+
+def test_head_file_has_length_but_no_body():
+    response = server.handle_http_request(request('HEAD', '/text.txt'))
+    get = server.handle_http_request(request('GET', '/text.txt'))
+    try:
+        assert response.headers['Content-Length'] == get.headers['Content-Length']
+        assert response.count == 0
+        assert response.file is None
+    finally:
+        get.close()
+
+def test_head_page_has_no_body():
+    response = server.handle_http_request(request('HEAD', '/'))
+    get = server.handle_http_request(request('GET', '/'))
+    assert get.startswith(response)
+    assert response.endswith(b'\r\n\r\n')
+    assert b'Content-Length: ' in response
+    assert len(get) > len(response)
@@ -0,0 +1,173 @@
+'''
+Асинхронный вариант common/upstream.py для task3_async.py.
+
+Все запросы к внешним API идут через один httpx.AsyncClient с ограничением
+числа соединений (ASYNC_MAX_CONNECTIONS) и keep-alive, поэтому медленный
+внешний API занимает не поток, а только корутину, и один процесс может
+ждать сотни ответов одновременно.
+
+Запросы сверх лимита соединений ждут в собственном asyncio.Semaphore, а не
+в очереди пула httpcore: там каждый освободившийся слот перебирает всю
+очередь, и при сотнях ожидающих запросов процесс упирается в CPU.
+
+Адреса API, таймауты и время жизни кеша - те же, что в common/upstream.py.
+Фотографии альбома кешируются так же (ttl + stale-while-revalidate, не
+больше CACHE_MAX_ENTRIES записей с вытеснением LRU), а одновременные
+промахи по одному ключу ждут один и тот же запрос.
+
+'''
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+import httpx
+
+from common.upstream import (CACHE_MAX_ENTRIES, CONNECT_TIMEOUT, DUCK_API_URL, FOX_API_URL, FOX_DEADLINE,
+                             PHOTOS_API_URL, PHOTOS_PER_PAGE, PHOTOS_STALE_TTL, PHOTOS_TTL, READ_TIMEOUT,
+                             UpstreamError, check_fox, paginate)
+
+ASYNC_MAX_CONNECTIONS = int(os.environ.get('ASYNC_MAX_CONNECTIONS', 200))
+ASYNC_MAX_KEEPALIVE = int(os.environ.get('ASYNC_MAX_KEEPALIVE', 50))
+
+class AsyncTTLCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._background = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _load(self, key, loader, ttl, stale_ttl):
+        # один запрос на ключ, сколько бы корутин его ни ждало
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(loader())
+            task.add_done_callback(lambda done: self._store(key, done, ttl, stale_ttl))
+        return task
+
+    def _store(self, key, task, ttl, stale_ttl):
+        del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+
+        now = time.monotonic()
+        self._entries[key] = (task.result(), now, now + ttl + stale_ttl)
+        self._entries.move_to_end(key)
+        while self._entries:
+            oldest_key, (_value, _loaded_at, keep_until) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and keep_until > now:
+                break
+            del self._entries[oldest_key]
+            self.evicted += 1
+
+    async def get(self, key, loader, ttl, stale_ttl=0):
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, loaded_at, _keep_until = entry
+            age = time.monotonic() - loaded_at
+            if age < ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            if age < ttl + stale_ttl:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                task = self._load(key, loader, ttl, stale_ttl)
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+                # ошибку фонового обновления не показываем, останется старое значение
+                task.add_done_callback(lambda done: done.cancelled() or done.exception())
+                return value
+
+        self.misses += 1
+        return await asyncio.shield(self._load(key, loader, ttl, stale_ttl))
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evicted': self.evicted,
+        }
+
+class AsyncUpstream:
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 max_connections=ASYNC_MAX_CONNECTIONS, max_keepalive=ASYNC_MAX_KEEPALIVE):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.max_connections = max_connections
+        self.client = None
+        self._slots = None
+        self.cache = AsyncTTLCache()
+
+    async def start(self):
+        self.client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        self._slots = asyncio.Semaphore(self.max_connections)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def get_json(self, url, **params):
+        try:
+            async with self._slots:
+                response = await self.client.get(url, params=params or None)
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise UpstreamError(f"{url}: {e}") from e
+
+    async def cached_json(self, url, ttl, stale_ttl=0, **params):
+        key = (url, tuple(sorted(params.items())))
+        return await self.cache.get(key, lambda: self.get_json(url, **params), ttl, stale_ttl)
+
+    def stats(self):
+        return {'cache': self.cache.stats()}
+
+upstream = AsyncUpstream()
+
+async def random_duck():
+    return await upstream.get_json(f'{DUCK_API_URL}/random')
+
+async def random_fox():
+    return check_fox(await upstream.get_json(f'{FOX_API_URL}/floof/'))
+
+async def random_foxes(count, deadline=FOX_DEADLINE):
+    deadline_at = time.monotonic() + deadline
+    foxes = {}
+
+    attempts = 0
+    while len(foxes) < count and attempts < count * 2:
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            break
+
+        tasks = [asyncio.create_task(random_fox()) for _ in range(count - len(foxes))]
+        attempts += len(tasks)
+        done, pending = await asyncio.wait(tasks, timeout=remaining)
+        for task in pending:
+            task.cancel()
+
+        loaded = [task.result() for task in done if task.exception() is None]
+        for fox in loaded:
+            foxes.setdefault(fox['image'], fox)
+        if pending or not loaded:
+            break
+
+    return list(foxes.values())[:count]
+
+async def album_photos(album_id=1):
+    return await upstream.cached_json(f'{PHOTOS_API_URL}/albums/{album_id}/photos', PHOTOS_TTL, PHOTOS_STALE_TTL)
+
+async def album_page(album_id=1, page=1, per_page=PHOTOS_PER_PAGE):
+    return paginate(await album_photos(album_id), page, per_page)
+
+def upstream_stats():
+    return upstream.stats()
@@ -0,0 +1,154 @@
+'''
+Бенчмарк task3.py (Flask, поток на запрос) против task3_async.py (FastAPI,
+httpx.AsyncClient) на медленном внешнем API.
+
+Запускает заглушку common/stub_upstream.py с задержкой --delay, затем по очереди
+оба приложения и нагружает выбранный путь --concurrency одновременными
+клиентами в течение --duration секунд. Flask работает в пуле из
+--sync-threads потоков (как gunicorn --threads), async-версия - в одном
+процессе uvicorn. Пулы уток и лис отключены, чтобы каждый запрос шел во
+внешний API.
+
+    python bench_async.py --delay 0.2 --concurrency 200 --path /duck/
+
+'''
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STUB_UPSTREAM = os.path.join(os.path.dirname(BASE_DIR), 'common', 'stub_upstream.py')
+
+SYNC_SERVER = '''
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from task3 import app
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+class PooledWSGIServer(WSGIServer):
+    request_queue_size = 1024
+    pool = ThreadPoolExecutor(max_workers=int(sys.argv[2]))
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+make_server('127.0.0.1', int(sys.argv[1]), app, PooledWSGIServer, QuietHandler).serve_forever()
+'''
+
+def get_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Сервер не поднялся на порту {port}")
+
+def start(command, port, env):
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port(port)
+    return process
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        return response.startswith(b'HTTP/1.1 200') or response.startswith(b'HTTP/1.0 200')
+    finally:
+        writer.close()
+
+async def run_load(port, path, concurrency, duration):
+    deadline = time.monotonic() + duration
+    results = {'ok': 0, 'errors': 0, 'latencies': []}
+
+    async def client():
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                ok = await asyncio.wait_for(fetch(port, path), timeout=30)
+            except (OSError, asyncio.TimeoutError):
+                ok = False
+            results['ok' if ok else 'errors'] += 1
+            results['latencies'].append(time.monotonic() - started)
+
+    started = time.monotonic()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    results['seconds'] = time.monotonic() - started
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="task3.py против task3_async.py на медленном API")
+    parser.add_argument('--delay', type=float, default=0.2, help="задержка заглушки API, сек")
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--path', default='/duck/')
+    parser.add_argument('--sync-threads', type=int, default=16)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    stub_port = get_free_port()
+    stub_url = f'http://127.0.0.1:{stub_port}'
+    env = dict(os.environ, DUCK_API_URL=f'{stub_url}/api', FOX_API_URL=stub_url, PHOTOS_API_URL=stub_url,
+               DUCK_POOL_SIZE='0', FOX_POOL_SIZE='0', WEATHER_BACKEND='fake')
+
+    stub = start([sys.executable, STUB_UPSTREAM, '--port', str(stub_port), '--delay', str(args.delay)],
+                 stub_port, env)
+    servers = {
+        f'flask ({args.sync_threads} потоков)': lambda port: [sys.executable, '-c', SYNC_SERVER, str(port),
+                                                            str(args.sync_threads)],
+        'fastapi (asyncio)': lambda port: [sys.executable, '-m', 'uvicorn', 'task3_async:app',
+                                           '--port', str(port), '--log-level', 'warning'],
+    }
+
+    print(f"путь {args.path}, задержка API {args.delay} с, клиентов {args.concurrency}")
+    print(f"{'сервер':<22} {'успешно':>8} {'ошибки':>7} {'запр/с':>8} {'p50, мс':>8} {'p99, мс':>8}")
+    try:
+        for name, command in servers.items():
+            port = get_free_port()
+            process = start(command(port), port, env)
+            try:
+                result = asyncio.run(run_load(port, args.path, args.concurrency, args.duration))
+            finally:
+                process.terminate()
+                process.wait()
+
+            latencies = sorted(result['latencies']) or [0.0]
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+            print(f"{name:<22} {result['ok']:>8} {result['errors']:>7} "
+                  f"{result['ok'] / result['seconds']:>8.1f} {p50:>8.0f} {p99:>8.0f}")
+    finally:
+        stub.terminate()
+        stub.wait()
+
+if __name__ == "__main__":
+    main()
@@ -21,14 +21,23 @@
 
 '''
 
-from flask import Flask, render_template
-import requests
+import os
+import sys
+
+from flask import Flask, jsonify, render_template, request, stream_template
 from pyowm import OWM
 from pyowm.utils.config import get_default_config
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.breaker import CircuitBreaker
+from common.upstream import PHOTOS_PER_PAGE, album_page, random_duck, random_foxes, upstream_stats
+from common.weather import WeatherCache, create_backend
+
 config_dict = get_default_config()
 config_dict['language'] = 'ru'
 owm = OWM('f7ab670dd123e8e33a8296b1d5ebf253', config_dict)
+weather_cache = WeatherCache(create_backend(owm), breaker=CircuitBreaker('weather', ignore=(LookupError,)))
 
 app = Flask(__name__)
 
@@ -39,9 +48,7 @@ def index():
 @app.route("/duck/")
 def duck():
     try:
-        response = requests.get('https://random-d.uk/api/random')
-        response.raise_for_status()
-        duck_data = response.json()
+        duck_data = random_duck()
         duck_number = duck_data['url'].split('/')[-1].split('.')[0]
         return render_template('duck.html', duck=duck_data, duck_number=duck_number)
     except Exception as e:
@@ -59,11 +66,11 @@ def fox(num=1):
         return render_template('fox.html', message="Можно только от 1 до 10.")
     
     try:
-        response = requests.get('https://randomfox.ca/floof/')
-        response.raise_for_status()
-        fox_data = response.json()
-        
-        return render_template('fox.html', fox=fox_data, num=num, message=None)
+        foxes = random_foxes(num)
+        if not foxes:
+            return render_template('fox.html', message="Ошибка получения данных.")
+
+        return render_template('fox.html', foxes=foxes, num=num, message=None)
     except Exception as e:
         return render_template('fox.html', message="Ошибка получения данных.")
 
@@ -71,16 +78,7 @@ def fox(num=1):
 @app.route("/weather/<string:city>/")
 def weather(city="Minsk"):
     try:
-        weather_manager = owm.weather_manager()
-        observation = weather_manager.weather_at_place(city)
-        weather = observation.weather
-        
-        weather_data = {
-            'city': city,
-            'status': weather.detailed_status,
-            'temp': weather.temperature('celsius')['temp'],
-            'temp_feels': weather.temperature('celsius')['feels_like'],
-        }
+        weather_data = dict(weather_cache.get(city), city=city)
         
         return render_template('weather.html', weather=weather_data, city=city)
     except Exception as e:
@@ -91,16 +89,25 @@ def weather_minsk():
     return weather('Minsk')
 
 @app.route("/photos/")
-def photos():
+@app.route("/photos/<int:album_id>/")
+def photos(album_id=1):
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', PHOTOS_PER_PAGE, type=int)
     try:
-        response = requests.get('https://jsonplaceholder.typicode.com/albums/1/photos')
-        response.raise_for_status()
-        photos = response.json()
-
-        return render_template('photos.html', photos=photos)
+        photos, pagination = album_page(album_id, page, per_page)
     except Exception as e:
         return render_template('photos.html', message="Не удалось загрузить фотографии")
 
+    if not photos:
+        return render_template('photos.html', message=f"В альбоме {album_id} нет фотографий")
+
+    # страница отдается по мере рендера, не дожидаясь всего списка
+    return stream_template('photos.html', photos=photos, pagination=pagination, album_id=album_id)
+
+@app.route("/upstream-stats/")
+def upstream_stats_page():
+    return jsonify(dict(upstream_stats(), weather=weather_cache.stats()))
+
 @app.errorhandler(404)
 def page_not_found(error):
     return render_template('error.html', error=error)
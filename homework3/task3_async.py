@@ -0,0 +1,118 @@
+'''
+Асинхронная версия task3.py на FastAPI (ASGI).
+
+Страницы те же и шаблоны те же, но запросы к внешним API выполняются через
+общий httpx.AsyncClient (async_upstream.py): пока утка, лиса или фотографии
+загружаются, процесс обслуживает другие запросы, а не держит на каждый из
+них поток. Погода берется из того же WeatherCache, что и в task3.py (pyowm -
+синхронная библиотека, поэтому промах кеша выполняется в пуле потоков).
+
+    uvicorn task3_async:app --port 3001
+
+'''
+
+import os
+import sys
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.templating import Jinja2Templates
+from pyowm import OWM
+from pyowm.utils.config import get_default_config
+from starlette.concurrency import run_in_threadpool
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_upstream import PHOTOS_PER_PAGE, album_page, random_duck, random_foxes, upstream, upstream_stats
+from common.breaker import CircuitBreaker, breaker_stats
+from common.weather import WeatherCache, create_backend
+
+config_dict = get_default_config()
+config_dict['language'] = 'ru'
+owm = OWM('f7ab670dd123e8e33a8296b1d5ebf253', config_dict)
+weather_cache = WeatherCache(create_backend(owm), breaker=CircuitBreaker('weather', ignore=(LookupError,)))
+
+BASE_DIR = os.path.dirname(__file__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await upstream.start()
+    yield
+    await upstream.close()
+
+app = FastAPI(lifespan=lifespan)
+templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+
+@app.get("/", response_class=HTMLResponse)
+async def index(request: Request):
+    return templates.TemplateResponse(request, "index.html")
+
+@app.get("/duck/", response_class=HTMLResponse)
+async def duck(request: Request):
+    try:
+        duck_data = await random_duck()
+        duck_number = duck_data['url'].split('/')[-1].split('.')[0]
+        return templates.TemplateResponse(request, "duck.html", {"duck": duck_data, "duck_number": duck_number})
+    except Exception:
+        error_data = {
+            'url': 'https://random-d.uk/api/placeholder.jpg',
+            'message': 'Упс..! Ошибка'
+        }
+        return templates.TemplateResponse(request, "duck.html", {"duck": error_data, "duck_number": "0"})
+
+@app.get("/fox/", response_class=HTMLResponse)
+@app.get("/fox/{num}/", response_class=HTMLResponse)
+async def fox(request: Request, num: int = 1):
+    if num < 1 or num > 10:
+        return templates.TemplateResponse(request, "fox.html", {"message": "Можно только от 1 до 10."})
+
+    try:
+        foxes = await random_foxes(num)
+    except Exception:
+        foxes = None
+    if not foxes:
+        return templates.TemplateResponse(request, "fox.html", {"message": "Ошибка получения данных."})
+
+    return templates.TemplateResponse(request, "fox.html", {"foxes": foxes, "num": num, "message": None})
+
+@app.get("/weather/", response_class=HTMLResponse)
+@app.get("/weather/{city}/", response_class=HTMLResponse)
+async def weather(request: Request, city: str = "Minsk"):
+    try:
+        weather_data = dict(await run_in_threadpool(weather_cache.get, city), city=city)
+        return templates.TemplateResponse(request, "weather.html", {"weather": weather_data, "city": city})
+    except Exception:
+        return templates.TemplateResponse(request, "weather.html",
+                                          {"message": f"Ошибка вывода погоды для {city}"})
+
+@app.get("/weather-minsk/", response_class=HTMLResponse)
+async def weather_minsk(request: Request):
+    return await weather(request, 'Minsk')
+
+@app.get("/photos/", response_class=HTMLResponse)
+@app.get("/photos/{album_id}/", response_class=HTMLResponse)
+async def photos(request: Request, album_id: int = 1, page: int = 1, per_page: int = PHOTOS_PER_PAGE):
+    try:
+        photos, pagination = await album_page(album_id, page, per_page)
+    except Exception:
+        return templates.TemplateResponse(request, "photos.html",
+                                          {"message": "Не удалось загрузить фотографии"})
+
+    if not photos:
+        return templates.TemplateResponse(request, "photos.html",
+                                          {"message": f"В альбоме {album_id} нет фотографий"})
+
+    # как stream_template во Flask: страница уходит по мере рендера
+    template = templates.get_template("photos.html")
+    return StreamingResponse(template.generate(request=request, photos=photos, pagination=pagination,
+                                               album_id=album_id), media_type="text/html")
+
+@app.get("/upstream-stats/")
+async def upstream_stats_page():
+    return JSONResponse(dict(upstream_stats(), weather=weather_cache.stats(), breakers=breaker_stats()))
+
+@app.exception_handler(404)
+async def page_not_found(request: Request, error):
+    return templates.TemplateResponse(request, "error.html", {"error": error.detail},
+                                      status_code=404)
@@ -0,0 +1,105 @@
+'''
+Бенчмарк входа (sign-in) в UserStore при большом числе пользователей.
+
+Заполняет базу --users пользователями (по умолчанию миллион) и меряет на
+случайных email:
+    - get() без кеша (поиск по уникальному индексу email),
+    - get() из LRU-кеша,
+    - проверку пароля (scrypt в пуле потоков),
+    - весь вход: get() + проверка пароля,
+    - для сравнения - поиск по полю без индекса (полный просмотр таблицы).
+
+Считать миллион хешей scrypt слишком долго, поэтому у всех заполненных
+пользователей один и тот же хеш пароля - на время поиска это не влияет.
+Готовую базу можно переиспользовать между запусками (--db).
+
+    python bench_users.py --users 1000000 --db /tmp/users-bench.db
+
+'''
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from user_store import SCRYPT_N, UserStore, hash_password
+
+PASSWORD = 'Passw0rd'
+CHUNK = 50000
+
+def populate(store, count, scrypt_n):
+    existing = len(store)
+    if existing >= count:
+        return existing
+
+    encoded = hash_password(PASSWORD, scrypt_n)
+    connection = store._connection()
+    for start in range(existing, count, CHUNK):
+        rows = [
+            (f'user{i}@example.com', f'user_{i:07d}', 'Иван Иванов', '30', encoded, os.urandom(16).hex())
+            for i in range(start, min(start + CHUNK, count))
+        ]
+        connection.execute('BEGIN IMMEDIATE')
+        connection.executemany(
+            'INSERT INTO users (email, login, fullname, age, password, key) VALUES (?, ?, ?, ?, ?, ?)', rows)
+        connection.execute('COMMIT')
+    return count
+
+def measure(function, samples):
+    latencies = []
+    for argument in samples:
+        started = time.perf_counter()
+        function(argument)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        'p50': latencies[len(latencies) // 2] * 1000,
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'max': latencies[-1] * 1000,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Задержка входа в UserStore при большом числе пользователей")
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--samples', type=int, default=2000, help="число поисков на замер")
+    parser.add_argument('--password-samples', type=int, default=100, help="число проверок пароля")
+    parser.add_argument('--scan-samples', type=int, default=3, help="число поисков без индекса")
+    parser.add_argument('--scrypt-n', type=int, default=SCRYPT_N)
+    parser.add_argument('--db', help="файл базы (по умолчанию временный)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix='users-bench-'), 'users.db')
+
+    store = UserStore(path, scrypt_n=args.scrypt_n)
+    started = time.perf_counter()
+    total = populate(store, args.users, args.scrypt_n)
+    print(f"пользователей: {total}, заполнение {time.perf_counter() - started:.1f} с, база {path}")
+
+    emails = [f'user{random.randrange(total)}@example.com' for _ in range(args.samples)]
+    connection = store._connection()
+    fullnames = [f'Нет Такого {i}' for i in range(args.scan_samples)]
+
+    def sign_in(email):
+        return store.get(email) and store.check_password(email, PASSWORD)
+
+    results = {
+        'get, без кеша': measure(store.get, emails),
+        'get, LRU-кеш': measure(store.get, emails),
+        'проверка пароля': measure(lambda email: store.check_password(email, PASSWORD),
+                                   emails[:args.password_samples]),
+        'вход целиком': measure(sign_in, emails[-args.password_samples:]),
+        'поиск без индекса': measure(lambda fullname: connection.execute(
+            'SELECT email FROM users WHERE fullname = ?', (fullname,)).fetchone(), fullnames),
+    }
+
+    print(f"{'операция':<20} {'p50, мс':>9} {'p99, мс':>9} {'max, мс':>9}")
+    for name, result in results.items():
+        print(f"{name:<20} {result['p50']:>9.3f} {result['p99']:>9.3f} {result['max']:>9.3f}")
+    print(store.stats())
+    store.close()
+
+if __name__ == "__main__":
+    main()
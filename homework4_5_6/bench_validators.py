@@ -0,0 +1,108 @@
+'''
+Микро-бенчмарк validators.py против прежних проверок из task3.py
+(re.fullmatch со строковым шаблоном на каждый вызов и пароль через
+опережающие проверки).
+
+Генерирует --records записей регистрации (часть с ошибками), меряет время
+одной проверки каждого поля и проверку всей пачки через validate_batch().
+
+    python bench_validators.py --records 100000
+
+'''
+
+import argparse
+import random
+import re
+import string
+import time
+
+from validators import is_cyrillic, is_valid_login, is_valid_password, validate_batch
+
+def old_is_cyrillic(text):
+    return bool(re.fullmatch('[а-яА-ЯёЁ\\s]+', text))
+
+def old_is_valid_login(login):
+    return bool(re.fullmatch('^[a-zA-Z0-9_]{6,20}$', login))
+
+def old_is_valid_password(password):
+    return bool(re.fullmatch('^(?=.*[a-z])(?=.*[A-Z])(?=.*\\d)[a-zA-Z\\d]{8,15}$', password))
+
+def old_validate_batch(records):
+    # как прежний sign_up: все три проверки, ошибки - в словарь
+    valid = []
+    for record in records:
+        errors = {}
+        if not old_is_cyrillic(record['fullname']):
+            errors['fullname'] = 'Имя и Фамилия обязаны быть кириллицей!'
+        if not old_is_valid_login(record['login']):
+            errors['login'] = 'Некорректный логин!'
+        if not old_is_valid_password(record['password']):
+            errors['password'] = 'Некорректный пароль!'
+        if not errors:
+            valid.append(record)
+    return valid
+
+def make_record(rng, i):
+    letters = string.ascii_letters + string.digits
+    record = {
+        'email': f'user{i}@example.com',
+        'login': f'user_{i:07d}',
+        'password': ''.join(rng.choice(letters) for _ in range(rng.randint(8, 15))),
+        'fullname': rng.choice(['Иван Иванов', 'Пётр Петров', 'Анна Смирнова']),
+        'age': str(rng.randint(12, 100)),
+    }
+    broken = rng.random()
+    if broken < 0.05:
+        record['fullname'] = 'Ivan Ivanov'
+    elif broken < 0.10:
+        record['login'] = 'usr'
+    return record
+
+def per_call(function, values, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for value in values:
+            function(value)
+    return (time.perf_counter() - started) / (repeat * len(values)) * 1e9
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="validators.py против прежних проверок регистрации")
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    records = [make_record(rng, i) for i in range(args.records)]
+
+    for record in records:
+        assert old_is_valid_password(record['password']) == is_valid_password(record['password'])
+
+    checks = [
+        ('fullname', old_is_cyrillic, is_cyrillic),
+        ('login', old_is_valid_login, is_valid_login),
+        ('password', old_is_valid_password, is_valid_password),
+    ]
+    print(f"{'проверка':<12} {'было, нс':>10} {'стало, нс':>10} {'ускорение':>10}")
+    for field, old, new in checks:
+        values = [record[field] for record in records]
+        old_ns = per_call(old, values, args.repeat)
+        new_ns = per_call(new, values, args.repeat)
+        print(f"{field:<12} {old_ns:>10.0f} {new_ns:>10.0f} {old_ns / new_ns:>9.2f}x")
+
+    started = time.perf_counter()
+    old_validate_batch(records)
+    old_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    _valid, _invalid, report = validate_batch(records)
+    new_seconds = time.perf_counter() - started
+
+    print(f"\nпачка из {args.records} записей: было {old_seconds * 1000:.0f} мс (3 поля), "
+          f"стало {new_seconds * 1000:.0f} мс (5 полей, с подсчетом ошибок)")
+    print(report.as_dict())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+'''
+Кеш готовых ответов для страниц task3.py, которые почти не меняются
+(главная, /homework-5/).
+
+Страница рендерится один раз для каждой пары (эндпоинт + аргументы,
+состояние авторизации) и хранится в памяти вместе с заранее сжатыми gzip и,
+если установлен пакет brotli, br версиями. Повторный просмотр - это выбор
+готового тела по Accept-Encoding, без Jinja и без сжатия на лету. Страницы,
+которые не зависят от пользователя, объявляются как cached(per_user=False)
+и хранятся одной записью на всех.
+
+Сжатие идет при промахе, в потоке запроса, поэтому уровни умеренные
+(GZIP_LEVEL, BROTLI_QUALITY): максимальные жмут на несколько процентов
+лучше, но в десятки раз дольше.
+
+У каждого тела есть ETag, ответы помечены Cache-Control: private, no-cache,
+поэтому браузер каждый раз переспрашивает страницу с If-None-Match и при
+совпадении получает пустой 304.
+
+Запись хранит шаблоны, из которых собрана страница: отрендеренные
+(сигнал template_rendered) и все, от которых они зависят через extends,
+include и import. Если включена перезагрузка шаблонов (debug или
+TEMPLATES_AUTO_RELOAD) и какой-то из них изменился на диске
+(is_up_to_date), запись выбрасывается и страница рендерится заново.
+
+'''
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g, request, template_rendered
+from jinja2 import meta
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MAX_ENTRIES = 1024
+MIN_COMPRESS_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+class PageEntry:
+    def __init__(self, body, mimetype, templates, min_compress_size=MIN_COMPRESS_SIZE):
+        self.mimetype = mimetype
+        self.templates = templates
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.bodies = {'identity': body}
+        if len(body) >= min_compress_size:
+            self.bodies['gzip'] = gzip.compress(body, GZIP_LEVEL, mtime=0)
+            if brotli is not None:
+                self.bodies['br'] = brotli.compress(body, quality=BROTLI_QUALITY)
+
+    def is_up_to_date(self):
+        return all(template.is_up_to_date for template in self.templates)
+
+class PageCache:
+    def __init__(self, app, auth_state, max_entries=MAX_ENTRIES):
+        self.app = app
+        self.auth_state = auth_state
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.reloads = 0
+
+        template_rendered.connect(self._template_rendered, app)
+
+    def cached(self, view=None, per_user=True):
+        if view is None:
+            return lambda view: self.cached(view, per_user)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            key = (request.endpoint, tuple(sorted(kwargs.items())), self.auth_state() if per_user else None)
+            entry = self._get(key)
+            if entry is None:
+                g.page_cache_rendered = []
+                response = self.app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                entry = self._store(key, response, g.pop('page_cache_rendered'))
+            return self._respond(entry)
+
+        return wrapper
+
+    def _template_rendered(self, app, template, context, **extra):
+        rendered = g.get('page_cache_rendered')
+        if rendered is not None:
+            rendered.append(template.name)
+
+    def _dependencies(self, names):
+        env = self.app.jinja_env
+        templates = {}
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            if name is None or name in templates:
+                continue
+            templates[name] = env.get_template(name)
+            source = env.loader.get_source(env, name)[0]
+            # имена родителей и включений; вычисляемые имена (None) пропускаются
+            pending.extend(meta.find_referenced_templates(env.parse(source)))
+        return list(templates.values())
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.app.jinja_env.auto_reload and not entry.is_up_to_date():
+                del self._entries[key]
+                self.reloads += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _store(self, key, response, rendered):
+        entry = PageEntry(response.get_data(), response.mimetype, self._dependencies(rendered))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _respond(self, entry):
+        accept = request.accept_encodings
+        encoding = 'identity'
+        for candidate in ('br', 'gzip'):
+            if candidate in entry.bodies and accept[candidate]:
+                encoding = candidate
+                break
+
+        response = Response(entry.bodies[encoding], mimetype=entry.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.set_etag(f'{entry.etag}-{encoding}')
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            with self._lock:
+                self.not_modified += 1
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'reloads': self.reloads,
+                'brotli': brotli is not None,
+            }
@@ -0,0 +1,120 @@
+'''
+Проверка входа для страниц task3.py.
+
+Доступ к странице объявляется декоратором рядом с ней:
+
+    @public      - доступна всем (главная, импорт по токену)
+    @guest_only  - только без входа (sign-in, sign-up), вошедших
+                   перенаправляет на главную
+    без декоратора - только после входа, остальных перенаправляет на
+                   sign-in (как и неизвестные адреса)
+
+RouteAuth.compile() один раз после регистрации всех страниц собирает из
+этих пометок два frozenset эндпоинтов, поэтому проверка на каждый запрос -
+это поиск во множестве и, если нужно, чтение сессии, а не сравнение путей
+и списков.
+
+Время каждой проверки пишется в заголовок Server-Timing (auth;dur=мс) и
+в статистику RouteAuth.stats() - задержки последних latency_window проверок.
+
+'''
+
+import threading
+import time
+from collections import deque
+
+from flask import g, redirect, request, session, url_for
+
+PUBLIC = 'public'
+GUEST_ONLY = 'guest_only'
+
+def public(view):
+    view.auth_access = PUBLIC
+    return view
+
+def guest_only(view):
+    view.auth_access = GUEST_ONLY
+    return view
+
+class RouteAuth:
+    def __init__(self, app, login_endpoint='sign_in', home_endpoint='index', latency_window=1000):
+        self.app = app
+        self.login_endpoint = login_endpoint
+        self.home_endpoint = home_endpoint
+        self.public_endpoints = frozenset()
+        self.guest_endpoints = frozenset()
+        self.compiled = False
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self.checks = 0
+        self.redirects = 0
+
+        app.before_request(self.check)
+        app.after_request(self._add_server_timing)
+
+    def compile(self):
+        access = {endpoint: getattr(view, 'auth_access', None) for endpoint, view in self.app.view_functions.items()}
+        # статика обычно отдается раньше Flask, сюда доходят только промахи
+        access['static'] = PUBLIC
+        self.public_endpoints = frozenset(endpoint for endpoint, level in access.items() if level == PUBLIC)
+        self.guest_endpoints = frozenset(endpoint for endpoint, level in access.items() if level == GUEST_ONLY)
+        self.compiled = True
+
+    def _decide(self):
+        endpoint = request.endpoint
+        if endpoint in self.public_endpoints:
+            return None
+
+        if endpoint in self.guest_endpoints:
+            if session.get('user'):
+                return redirect(url_for(self.home_endpoint))
+            return None
+
+        if not session.get('user'):
+            return redirect(url_for(self.login_endpoint))
+        return None
+
+    def check(self):
+        started = time.perf_counter()
+        if not self.compiled:
+            self.compile()
+
+        response = self._decide()
+
+        duration = time.perf_counter() - started
+        g.auth_duration = duration
+        with self._lock:
+            self.checks += 1
+            self.redirects += response is not None
+            self._latencies.append(duration)
+        return response
+
+    def _add_server_timing(self, response):
+        duration = g.get('auth_duration')
+        if duration is not None:
+            response.headers.add('Server-Timing', f'auth;dur={duration * 1000:.3f}')
+        return response
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            checks = self.checks
+            redirects = self.redirects
+
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1e6, 1)
+
+        return {
+            'checks': checks,
+            'redirects': redirects,
+            'public': sorted(self.public_endpoints),
+            'guest_only': sorted(self.guest_endpoints),
+            'latency_us': {
+                'p50': percentile(0.5),
+                'p99': percentile(0.99),
+                'max': percentile(1.0),
+            },
+        }
@@ -21,39 +21,71 @@
 
 '''
 
-import re
+import hmac
+import io
 import os
-import requests
-from flask import Flask, request, session, redirect, url_for, render_template
+import sys
+from flask import (Flask, Response, jsonify, request, session, redirect, url_for, render_template,
+                   stream_template, stream_with_context)
 from pyowm import OWM
 from pyowm.utils.config import get_default_config
+from werkzeug.middleware.shared_data import SharedDataMiddleware
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.breaker import CircuitBreaker
+from common.upstream import PHOTOS_PER_PAGE, album_page, random_duck, random_foxes, upstream_stats
+from common.weather import WeatherCache, create_backend
+from page_cache import PageCache
+from route_auth import RouteAuth, guest_only, public
+from user_import import CHUNK_SIZE, CONTENT_TYPES, FORMATS, export_users, import_users
+from user_store import UserExistsError, UserStore
+from validators import validate_user
 
 config_dict = get_default_config()
 config_dict['language'] = 'ru'
 owm = OWM('f7ab670dd123e8e33a8296b1d5ebf253', config_dict)
+weather_cache = WeatherCache(create_backend(owm), breaker=CircuitBreaker('weather', ignore=(LookupError,)))
 
 BASE_FOLDER = os.path.dirname(__file__)
+STATIC_FOLDER = os.path.join(BASE_FOLDER, "static")
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 365 * 24 * 3600))
+
+def static_version(folder):
+    # версия статики - время последнего изменения файлов; она входит в путь
+    # (/static/<версия>/...), так что относительные @import в css тоже
+    # получают новый адрес, и долгий max-age не мешает обновлениям
+    mtimes = [os.path.getmtime(os.path.join(root, name))
+              for root, _dirs, names in os.walk(folder) for name in names]
+    return format(int(max(mtimes, default=0)), 'x')
 
 app = Flask(__name__,
-            static_folder=os.path.join(BASE_FOLDER, "static"),
+            static_folder=STATIC_FOLDER,
+            static_url_path=f'/static/{static_version(STATIC_FOLDER)}',
             template_folder=os.path.join(BASE_FOLDER, "templates"))
 app.config['SECRET_KEY'] = os.urandom(39).hex()
+# статику отдает middleware до Flask: без before_request, сессии и проверки входа
+app.wsgi_app = SharedDataMiddleware(app.wsgi_app, {app.static_url_path: STATIC_FOLDER},
+                                    cache_timeout=STATIC_MAX_AGE)
+route_auth = RouteAuth(app)
+# токен для /users/import/ и /users/export/, без него эти страницы отключены
+USERS_ADMIN_TOKEN = os.environ.get('USERS_ADMIN_TOKEN')
 
-users = {}
+users = UserStore()
 
 def get_current_user():
-    return users.get(session.get('user'))
-
-def is_cyrillic(text):
-    return bool(re.fullmatch('[а-яА-ЯёЁ\s]+', text))
+    email = session.get('user')
+    return users.get(email) if email else None
 
-def is_valid_login(login):
-    return bool(re.fullmatch('^[a-zA-Z0-9_]{6,20}$', login))
+def auth_state():
+    user = get_current_user()
+    return user['key'] if user else None
 
-def is_valid_password(password):
-    return bool(re.fullmatch('^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)[a-zA-Z\d]{8,15}$', password))
+page_cache = PageCache(app, auth_state)
 
 @app.route("/")
+@public
+@page_cache.cached
 def index():
     user = get_current_user()
 
@@ -62,10 +94,8 @@ def index():
 @app.route("/duck/")
 def duck():
     try:
-        response = requests.get('https://random-d.uk/api/random')
-        response.raise_for_status()
         user = get_current_user()
-        duck_data = response.json()
+        duck_data = random_duck()
         duck_number = duck_data['url'].split('/')[-1].split('.')[0]
         return render_template('duck.html', user=user, duck=duck_data, duck_number=duck_number)
     except Exception as e:
@@ -83,12 +113,12 @@ def fox(num=1):
         return render_template('fox.html', message="Можно только от 1 до 10.")
     
     try:
-        response = requests.get('https://randomfox.ca/floof/')
-        response.raise_for_status()
         user = get_current_user()
-        fox_data = response.json()
-        
-        return render_template('fox.html', user=user, fox=fox_data, fox_number=num, message=None)
+        foxes = random_foxes(num)
+        if not foxes:
+            return render_template('fox.html', message="Ошибка получения данных.")
+
+        return render_template('fox.html', user=user, foxes=foxes, fox_number=num, message=None)
     except Exception as e:
         return render_template('fox.html', message="Ошибка получения данных.")
 
@@ -97,16 +127,7 @@ def fox(num=1):
 def weather(city="Minsk"):
     try:
         user = get_current_user()
-        weather_manager = owm.weather_manager()
-        observation = weather_manager.weather_at_place(city)
-        weather = observation.weather
-        
-        weather_data = {
-            'city': city,
-            'status': weather.detailed_status,
-            'temp': weather.temperature('celsius')['temp'],
-            'temp_feels': weather.temperature('celsius')['feels_like'],
-        }
+        weather_data = dict(weather_cache.get(city), city=city)
         
         return render_template('weather.html', user=user, weather=weather_data, city=city)
     except Exception as e:
@@ -117,21 +138,25 @@ def weather_minsk():
     return weather('Minsk')
 
 @app.route("/photos/")
-def photos():
+@app.route("/photos/<int:album_id>/")
+def photos(album_id=1):
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', PHOTOS_PER_PAGE, type=int)
     try:
-        response = requests.get('https://jsonplaceholder.typicode.com/albums/1/photos')
-        response.raise_for_status()
         user = get_current_user()
-        photos = response.json()
-
-        return render_template('photos.html', user=user, photos=photos)
+        photos, pagination = album_page(album_id, page, per_page)
     except Exception as e:
         return render_template('photos.html', message="Не удалось загрузить фотографии")
 
+    if not photos:
+        return render_template('photos.html', user=user, message=f"В альбоме {album_id} нет фотографий")
+
+    # страница отдается по мере рендера, не дожидаясь всего списка
+    return stream_template('photos.html', user=user, photos=photos, pagination=pagination, album_id=album_id)
+
 @app.route("/sign-up/", methods=['GET', 'POST'])
+@guest_only
 def sign_up():
-    global tmp_email
-    user = get_current_user()
     errors = {}
     form = {
         'email': '',
@@ -142,32 +167,23 @@ def sign_up():
     }
 
     if request.method == 'POST':
-        if not is_cyrillic(request.form.get('fullname')):
-            errors['fullname'] = 'Имя и Фамилия обязаны быть кириллицей!'
-
-        if not is_valid_login(request.form.get('login')):
-            errors['login'] = 'Некорректный логин!'
-
-        if not is_valid_password(request.form.get('password')):
-            errors['password'] = 'Некорректный пароль!'
-
+        errors = validate_user(request.form)
         form = dict(request.form)
 
         if errors:
             return render_template('sign-up.html', form=form, errors=errors)
-        else:
-            if user:
-                errors['auth'] = 'Такой пользователь уже существует'
-                return render_template('sign-up.html', form=form, errors=errors)
 
-            new_form = form
-            new_form['key'] = os.urandom(39).hex()
-            users[new_form['email']] = new_form
-            return redirect(url_for('sign_in'))
+        try:
+            users.create(form['email'], form['login'], form['password'], form['fullname'], form['age'])
+        except UserExistsError:
+            errors['auth'] = 'Такой пользователь уже существует'
+            return render_template('sign-up.html', form=form, errors=errors)
+        return redirect(url_for('sign_in'))
 
     return render_template('sign-up.html', form=form)
 
 @app.route("/sign-in/", methods=['GET', 'POST'])
+@guest_only
 def sign_in():
     errors = {}
     form = {
@@ -177,21 +193,16 @@ def sign_in():
 
     if request.method == 'POST':
         form = dict(request.form)
-        session['user'] = form['email']
-        user = get_current_user()
 
-        if not user:
-            return render_template('sign-in.html', form=form, errors=errors)
-
-        if not user.get('email'):
+        if not users.get(form['email']):
             errors['email'] = 'Такого email не существует!'
-        
-        if user.get('password') != form['password']:
+        elif not users.check_password(form['email'], form['password']):
             errors['password'] = 'Неправильный пароль!'
-        
+
         if errors:
             return render_template('sign-in.html', form=form, errors=errors)
 
+        session['user'] = form['email']
         return redirect(url_for('index'))
 
     return render_template('sign-in.html', form=form)
@@ -202,23 +213,53 @@ def sign_out():
     return redirect(url_for('sign_in'))
 
 @app.route("/homework-5/")
+@page_cache.cached(per_user=False)
 def homework():
     return render_template('homework-5.html')
 
+def is_admin_request():
+    if not USERS_ADMIN_TOKEN:
+        return False
+    header = request.headers.get('Authorization', '')
+    return hmac.compare_digest(header.encode(), f'Bearer {USERS_ADMIN_TOKEN}'.encode())
+
+def transfer_format():
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'csv' if request.mimetype == CONTENT_TYPES['csv'] else 'ndjson'
+    return fmt if fmt in FORMATS else 'ndjson'
+
+@app.route("/users/import/", methods=['POST'])
+@public
+def users_import():
+    if not is_admin_request():
+        return jsonify(error="Нужен токен администратора"), 403
+
+    # тело читается потоком, построчно
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    chunk_size = request.args.get('chunk_size', CHUNK_SIZE, type=int)
+    report = import_users(users, lines, transfer_format(), max(1, chunk_size))
+    return jsonify(report.as_dict())
+
+@app.route("/users/export/")
+@public
+def users_export():
+    if not is_admin_request():
+        return jsonify(error="Нужен токен администратора"), 403
+
+    fmt = transfer_format()
+    return Response(stream_with_context(export_users(users, fmt)), mimetype=CONTENT_TYPES[fmt])
+
+@app.route("/upstream-stats/")
+def upstream_stats_page():
+    return jsonify(dict(upstream_stats(), weather=weather_cache.stats(), page_cache=page_cache.stats(),
+                        users=users.stats(), route_auth=route_auth.stats()))
+
 @app.errorhandler(404)
 def page_not_found(error):
     return render_template('error.html', error=error)
 
-@app.before_request
-def check_auth():
-    if request.path.startswith('/static/'):
-        return
-
-    if request.endpoint in ['sign_in', 'sign_up'] and session.get('user'):
-        return redirect(url_for('index'))
-
-    if request.endpoint not in ['sign_in', 'sign_up', 'index'] and not session.get('user'):
-        return redirect(url_for('sign_in'))
+route_auth.compile()
 
 if __name__ == "__main__":
     app.run(port=3000, debug=True)
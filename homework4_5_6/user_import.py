@@ -0,0 +1,180 @@
+'''
+Массовый импорт и экспорт пользователей task3.py (NDJSON или CSV).
+
+Импорт читает поток построчно, проверяет каждую запись теми же правилами,
+что и форма регистрации (validators.py), и добавляет корректные записи в
+UserStore пачками по chunk_size, каждая пачка - одна транзакция. В памяти
+одновременно только одна пачка, поэтому размер файла не важен.
+Пользователи, у которых email или логин уже заняты, пропускаются и
+считаются в duplicates. Отклоненные записи (не прошли проверку или строка
+не разбирается: не объект JSON, лишние столбцы CSV) перечисляются в
+rejected с номером записи, первые MAX_REJECTED. Вместо пароля запись может содержать password_hash
+(так выглядит экспорт), тогда пароль не хешируется заново.
+
+Экспорт - генераторы строк поверх UserStore.iter_users(): пользователи
+читаются из базы порциями и сразу отдаются, весь список не собирается.
+
+Те же функции использует task3.py (/users/import/ и /users/export/), а из
+командной строки:
+
+    python user_import.py import users.ndjson
+    python user_import.py import users.csv --chunk-size 10000
+    python user_import.py export users.csv
+    cat users.ndjson | python user_import.py import - --format ndjson
+
+'''
+
+import argparse
+import csv
+import io
+import json
+import sys
+
+from user_store import EXPORT_FIELDS, USERS_DB, UserStore
+from validators import BatchReport, iter_validated
+
+CHUNK_SIZE = 5000
+MAX_REJECTED = 100
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+FORMAT_ERRORS = {
+    'ndjson': 'Строка не является объектом JSON',
+    'csv': 'В строке CSV больше полей, чем в заголовке',
+}
+
+class ImportReport(BatchReport):
+    def __init__(self):
+        super().__init__()
+        self.imported = 0
+        self.duplicates = 0
+        self.rejected = []
+
+    def reject(self, errors):
+        if len(self.rejected) < MAX_REJECTED:
+            self.rejected.append((self.total, errors))
+
+    def format_error(self, fmt):
+        # строку, которая даже не разбирается, не проверяем
+        self.total += 1
+        self.errors['format'] += 1
+        self.reject({'format': FORMAT_ERRORS[fmt]})
+
+    def as_dict(self):
+        return dict(super().as_dict(), imported=self.imported, duplicates=self.duplicates,
+                    rejected=[{'record': number, 'errors': errors} for number, errors in self.rejected])
+
+def detect_format(name, default='ndjson'):
+    if name and name.endswith('.csv'):
+        return 'csv'
+    if name and name.endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    return default
+
+def read_ndjson(lines, report):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            report.format_error('ndjson')
+            continue
+        yield record
+
+def read_csv(lines, report):
+    for record in csv.DictReader(lines):
+        # лишние значения DictReader складывает под ключ None
+        if None in record:
+            report.format_error('csv')
+            continue
+        yield record
+
+def read_records(lines, fmt, report):
+    if fmt == 'csv':
+        return read_csv(lines, report)
+    return read_ndjson(lines, report)
+
+def _flush(store, chunk, report):
+    results = store.add_many(chunk)
+    imported = sum(results)
+    report.imported += imported
+    report.duplicates += len(results) - imported
+
+def import_users(store, lines, fmt='ndjson', chunk_size=CHUNK_SIZE):
+    report = ImportReport()
+    chunk = []
+    for record, errors in iter_validated(read_records(lines, fmt, report), report, allow_hash=True):
+        if errors:
+            report.reject(errors)
+            continue
+
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            _flush(store, chunk, report)
+            chunk = []
+
+    if chunk:
+        _flush(store, chunk, report)
+    return report
+
+def export_ndjson(users):
+    for user in users:
+        yield json.dumps(user, ensure_ascii=False) + '\n'
+
+def export_csv(users):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for user in users:
+        writer.writerow(user)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def export_users(store, fmt='ndjson'):
+    users = store.iter_users()
+    if fmt == 'csv':
+        return export_csv(users)
+    return export_ndjson(users)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Импорт и экспорт пользователей task3.py")
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('path', help="файл (.ndjson/.jsonl или .csv), '-' - stdin/stdout")
+    parser.add_argument('--format', choices=FORMATS, help="по умолчанию - по расширению файла")
+    parser.add_argument('--db', default=USERS_DB)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    fmt = args.format or detect_format(args.path)
+    store = UserStore(args.db)
+    try:
+        if args.command == 'import':
+            if args.path == '-':
+                report = import_users(store, sys.stdin, fmt, args.chunk_size)
+            else:
+                with open(args.path, encoding='utf-8', newline='') as source:
+                    report = import_users(store, source, fmt, args.chunk_size)
+            print(json.dumps(report.as_dict(), ensure_ascii=False, indent=2))
+        else:
+            if args.path == '-':
+                sys.stdout.writelines(export_users(store, fmt))
+            else:
+                with open(args.path, 'w', encoding='utf-8', newline='') as target:
+                    target.writelines(export_users(store, fmt))
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
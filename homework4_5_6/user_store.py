@@ -0,0 +1,230 @@
+'''
+Хранилище пользователей для task3.py.
+
+Пользователи лежат в файле SQLite (USERS_DB, по умолчанию users.db рядом с
+task3.py), а не в словаре в памяти: учетные записи переживают перезапуск,
+и один файл могут одновременно использовать несколько процессов gunicorn
+(журнал WAL, у каждого потока свое соединение).
+
+Уникальность email и логина проверяет сама база - по уникальным индексам,
+по ним же идет поиск, поэтому вход стоит O(log n) при любом числе
+пользователей. get() держит перед базой LRU-кеш на cache_size записей:
+get_current_user() вызывается на каждый запрос, а учетные записи не
+меняются. Отсутствие пользователя не кешируется - его могли создать в
+другом процессе.
+
+Пароли хранятся как "scrypt$<n>$<r>$<p>$<salt>$<hash>", как в homework2.
+scrypt специально медленный, поэтому хеширование и проверка выполняются в
+отдельном пуле потоков (hashlib.scrypt отпускает GIL): поток запроса
+только ждет результат, а число одновременно считающихся хешей ограничено
+HASH_WORKERS.
+
+add_many() добавляет пачку пользователей одной транзакцией (для импорта,
+user_import.py), а iter_users() отдает всех пользователей порциями по
+первичному ключу, не загружая таблицу в память.
+
+'''
+
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_FOLDER = os.path.dirname(__file__)
+USERS_DB = os.environ.get('USERS_DB', os.path.join(BASE_FOLDER, 'users.db'))
+
+CACHE_SIZE = 10000
+HASH_WORKERS = int(os.environ.get('HASH_WORKERS', 4))
+
+SCRYPT_N = int(os.environ.get('SCRYPT_N', 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_SIZE = 16
+
+USER_FIELDS = ('email', 'login', 'fullname', 'age', 'key')
+EXPORT_FIELDS = ('email', 'login', 'fullname', 'age', 'password_hash')
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    salt = os.urandom(SALT_SIZE)
+    digest = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p)
+    return f"scrypt${n}${r}${p}${salt.hex()}${digest.hex()}"
+
+def verify_password(password, encoded):
+    try:
+        algorithm, n, r, p, salt, expected = encoded.split('$')
+        if algorithm != 'scrypt':
+            return False
+        digest = hashlib.scrypt(password.encode('utf-8'), salt=bytes.fromhex(salt),
+                                n=int(n), r=int(r), p=int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest.hex(), expected)
+
+class UserExistsError(Exception):
+    def __init__(self, field):
+        super().__init__(f"Пользователь с таким {field} уже существует")
+        self.field = field
+
+class UserStore:
+    def __init__(self, path=USERS_DB, cache_size=CACHE_SIZE, hash_workers=HASH_WORKERS,
+                 scrypt_n=SCRYPT_N, timeout=30.0):
+        self.path = path
+        self.cache_size = cache_size
+        self.scrypt_n = scrypt_n
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._hash_executor = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix='password-hash')
+        self.hits = 0
+        self.misses = 0
+
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                email TEXT NOT NULL,
+                login TEXT NOT NULL,
+                fullname TEXT NOT NULL,
+                age TEXT NOT NULL,
+                password TEXT NOT NULL,
+                key TEXT NOT NULL
+            )
+        ''')
+        connection.execute('CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users (email)')
+        connection.execute('CREATE UNIQUE INDEX IF NOT EXISTS users_login ON users (login)')
+
+    def _connection(self):
+        # у каждого потока свое соединение, sqlite3 не разрешает делить их
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _cache_put_locked(self, email, user):
+        self._cache[email] = user
+        self._cache.move_to_end(email)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, email):
+        with self._lock:
+            user = self._cache.get(email)
+            if user is not None:
+                self._cache.move_to_end(email)
+                self.hits += 1
+                return user
+            self.misses += 1
+
+        row = self._connection().execute(
+            'SELECT email, login, fullname, age, key FROM users WHERE email = ?', (email,)).fetchone()
+        if row is None:
+            return None
+
+        user = dict(zip(USER_FIELDS, row))
+        with self._lock:
+            self._cache_put_locked(email, user)
+        return user
+
+    def get_by_login(self, login):
+        row = self._connection().execute('SELECT email FROM users WHERE login = ?', (login,)).fetchone()
+        return self.get(row[0]) if row else None
+
+    def create(self, email, login, password, fullname, age):
+        encoded = self._hash_executor.submit(hash_password, password, self.scrypt_n).result()
+        user = {
+            'email': email,
+            'login': login,
+            'fullname': fullname,
+            'age': age,
+            'key': os.urandom(39).hex(),
+        }
+        try:
+            self._connection().execute(
+                'INSERT INTO users (email, login, fullname, age, password, key) VALUES (?, ?, ?, ?, ?, ?)',
+                (email, login, fullname, age, encoded, user['key']),
+            )
+        except sqlite3.IntegrityError as e:
+            # "UNIQUE constraint failed: users.email"
+            raise UserExistsError('login' if 'users.login' in str(e) else 'email') from e
+        return user
+
+    def _password_hash(self, record):
+        # при переносе из другой системы пароль может прийти уже хешированным
+        if not record.get('password'):
+            return record['password_hash']
+        return hash_password(record['password'], self.scrypt_n)
+
+    def add_many(self, records):
+        hashes = list(self._hash_executor.map(self._password_hash, records))
+        connection = self._connection()
+        results = []
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for record, encoded in zip(records, hashes):
+                cursor = connection.execute(
+                    'INSERT OR IGNORE INTO users (email, login, fullname, age, password, key) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (record['email'], record['login'], record['fullname'], str(record['age']), encoded,
+                     os.urandom(39).hex()),
+                )
+                results.append(cursor.rowcount == 1)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return results
+
+    def iter_users(self, batch_size=1000):
+        # отдельное соединение: генератор может читаться дольше одного запроса
+        connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        try:
+            last_id = 0
+            while True:
+                rows = connection.execute(
+                    'SELECT id, email, login, fullname, age, password FROM users WHERE id > ? ORDER BY id LIMIT ?',
+                    (last_id, batch_size)).fetchall()
+                if not rows:
+                    return
+                for row in rows:
+                    yield dict(zip(EXPORT_FIELDS, row[1:]))
+                last_id = rows[-1][0]
+        finally:
+            connection.close()
+
+    def check_password(self, email, password):
+        row = self._connection().execute('SELECT password FROM users WHERE email = ?', (email,)).fetchone()
+        if row is None:
+            return False
+        return self._hash_executor.submit(verify_password, password, row[0]).result()
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cached': len(self._cache),
+                'cache_size': self.cache_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def close(self):
+        self._hash_executor.shutdown(wait=False)
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+            self._cache.clear()
+        self._local = threading.local()
@@ -0,0 +1,118 @@
+'''
+Проверка данных регистрации для task3.py (форма /sign-up/ и импорт
+пользователей).
+
+Регулярные выражения компилируются один раз при импорте. Пароль проверяется
+без опережающих проверок (?=...): одно выражение проверяет длину и
+допустимые символы, а наличие строчной буквы, заглавной буквы и цифры -
+строковые методы, каждый из которых проходит строку один раз.
+
+При импорте (allow_hash=True) запись может вместо пароля содержать
+password_hash - готовый хеш scrypt из user_store.py; тогда проверяется
+формат хеша, а не правила пароля. Форма регистрации хеши не принимает.
+
+validate_user(record) возвращает словарь ошибок {поле: сообщение}, как их
+показывает форма. Для пачек записей (импорт из CSV) есть iter_validated() -
+генератор, который не держит в памяти всю пачку, и validate_batch(); оба
+считают ошибки по полям в BatchReport.
+
+'''
+
+import re
+from collections import Counter
+
+CYRILLIC_RE = re.compile(r'[а-яА-ЯёЁ\s]+')
+LOGIN_RE = re.compile(r'[a-zA-Z0-9_]{6,20}')
+PASSWORD_RE = re.compile(r'[a-zA-Z0-9]{8,15}')
+EMAIL_RE = re.compile(r'[^@\s]+@[^@\s]+')
+PASSWORD_HASH_RE = re.compile(r'scrypt\$\d+\$\d+\$\d+\$[0-9a-f]+\$[0-9a-f]+')
+
+MIN_AGE = 12
+MAX_AGE = 100
+
+ERRORS = {
+    'fullname': 'Имя и Фамилия обязаны быть кириллицей!',
+    'login': 'Некорректный логин!',
+    'password': 'Некорректный пароль!',
+    'email': 'Некорректный email!',
+    'age': f'Возраст должен быть от {MIN_AGE} до {MAX_AGE}!',
+}
+
+def is_cyrillic(text):
+    return isinstance(text, str) and CYRILLIC_RE.fullmatch(text) is not None
+
+def is_valid_login(login):
+    return isinstance(login, str) and LOGIN_RE.fullmatch(login) is not None
+
+def is_valid_password(password):
+    if not isinstance(password, str) or PASSWORD_RE.fullmatch(password) is None:
+        return False
+    # в строке только латиница и цифры, поэтому:
+    # есть строчная буква - upper() ее меняет, есть заглавная - lower(),
+    # есть цифра - строка не из одних букв
+    return password.upper() != password and password.lower() != password and not password.isalpha()
+
+def is_password_hash(encoded):
+    return isinstance(encoded, str) and PASSWORD_HASH_RE.fullmatch(encoded) is not None
+
+def is_valid_email(email):
+    return isinstance(email, str) and EMAIL_RE.fullmatch(email) is not None
+
+def is_valid_age(age):
+    try:
+        return MIN_AGE <= int(age) <= MAX_AGE
+    except (TypeError, ValueError):
+        return False
+
+CHECKS = (
+    ('fullname', is_cyrillic),
+    ('login', is_valid_login),
+    ('password', is_valid_password),
+    ('email', is_valid_email),
+    ('age', is_valid_age),
+)
+
+def validate_user(record, allow_hash=False):
+    errors = {field: ERRORS[field] for field, check in CHECKS if not check(record.get(field))}
+    if allow_hash and not record.get('password') and is_password_hash(record.get('password_hash')):
+        errors.pop('password', None)
+    return errors
+
+class BatchReport:
+    def __init__(self):
+        self.total = 0
+        self.valid = 0
+        self.errors = Counter()
+
+    @property
+    def invalid(self):
+        return self.total - self.valid
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'valid': self.valid,
+            'invalid': self.invalid,
+            'errors': dict(self.errors),
+        }
+
+def iter_validated(records, report, allow_hash=False):
+    for record in records:
+        errors = validate_user(record, allow_hash)
+        report.total += 1
+        if errors:
+            report.errors.update(errors.keys())
+        else:
+            report.valid += 1
+        yield record, errors
+
+def validate_batch(records):
+    report = BatchReport()
+    valid = []
+    invalid = []
+    for index, (record, errors) in enumerate(iter_validated(records, report)):
+        if errors:
+            invalid.append((index, errors))
+        else:
+            valid.append(record)
+    return valid, invalid, report